@@ -0,0 +1,49 @@
+# auth_window.py
+
+"""Окно входа через OAuth VK. QtWebEngine тяжёлый и нужен только здесь, поэтому
+модуль импортируется лишь тогда, когда сохранённого токена нет или он устарел."""
+
+from urllib.parse import urlparse, parse_qs
+
+from PySide6.QtWidgets import QWidget, QVBoxLayout
+from PySide6.QtCore import QUrl
+from PySide6.QtWebEngineWidgets import QWebEngineView
+
+from vk_api import API_VERSION
+from user_data import save_user_data
+
+CLIENT_ID = "6121396"  # Замените на свой
+REDIRECT_URI = "https://oauth.vk.com/blank.html"
+
+
+class AuthWindow(QWidget):
+    def __init__(self, on_token_received):
+        super().__init__()
+        self.on_token_received = on_token_received
+        self.setWindowTitle("Авторизация ВКонтакте")
+        self.resize(800, 600)
+        layout = QVBoxLayout()
+        self.webview = QWebEngineView()
+        layout.addWidget(self.webview)
+        self.setLayout(layout)
+        self.start_auth()
+
+    def start_auth(self):
+        url = (
+            f"https://oauth.vk.com/authorize?client_id={CLIENT_ID}"
+            f"&display=page&redirect_uri={REDIRECT_URI}"
+            f"&scope=market,photos,groups,offline"
+            f"&response_type=token&v={API_VERSION}"
+        )
+        self.webview.load(QUrl(url))
+        self.webview.urlChanged.connect(self.check_redirect)
+
+    def check_redirect(self, qurl):
+        if "access_token=" in qurl.toString():
+            fragment = urlparse(qurl.toString()).fragment
+            params = parse_qs(fragment)
+            token = params.get("access_token", [None])[0]
+            if token:
+                save_user_data({"access_token": token})
+                self.on_token_received(token)
+                self.close()
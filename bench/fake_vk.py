@@ -0,0 +1,277 @@
+# bench/fake_vk.py
+
+"""Локальная замена VK API для замеров без реального сообщества.
+
+Реализует методы, которыми пользуется приложение, сервер загрузки фото
+и раздачу картинок товаров. Задержка, лимит запросов в секунду и доля
+ошибок настраиваются.
+
+Запуск отдельно:
+    python bench/fake_vk.py --port 8765 --latency 0.05 --rps 3
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from io import BytesIO
+from urllib.parse import urlparse, parse_qs
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def make_photo(size):
+    """JPEG примерно нужного размера (без Pillow — просто случайные байты)"""
+    if Image is None:
+        return random.randbytes(size)
+    side = max(400, int((size / 0.3) ** 0.5))
+    image = Image.effect_noise((side, side), 64).convert("RGB")
+    out = BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def parse_execute(code):
+    """Разбираем код вида return [API.method({...}),...]; — такой строит ExecuteBatcher"""
+    decoder = json.JSONDecoder()
+    calls = []
+    pos = code.find("API.")
+    while pos != -1:
+        start = code.index("(", pos)
+        params, end = decoder.raw_decode(code, start + 1)
+        calls.append((code[pos + 4:start], params))
+        pos = code.find("API.", end)
+    return calls
+
+
+class FakeVk:
+    """Состояние фейкового VK: товары, фото, счётчики и настройки"""
+
+    def __init__(self, latency=0.05, jitter=0.02, upload_latency=0.1, rps=3, error_rate=0.0,
+                 photo_size=200 * 1024, groups=40):
+        self.latency = latency
+        self.jitter = jitter
+        self.upload_latency = upload_latency
+        self.rps = rps
+        self.error_rate = error_rate
+        self.photo_size = photo_size
+        self.groups = groups
+        self.base_url = ""
+
+        self.lock = threading.Lock()
+        self.calls = deque()
+        self.items = {}
+        self.albums = {}
+        self.next_id = 1
+        self.photo = None
+        self.stats = {"requests": 0, "methods": 0, "throttled": 0, "injected_errors": 0, "uploads": 0,
+                      "upload_bytes": 0}
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def sleep(self, latency):
+        if latency:
+            time.sleep(max(0.0, latency + random.uniform(-self.jitter, self.jitter)))
+
+    def throttled(self):
+        """Скользящее окно в 1 секунду, как у VK: сверх rps — ошибка 6"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            while self.calls and now - self.calls[0] > 1.0:
+                self.calls.popleft()
+            if self.rps and len(self.calls) >= self.rps:
+                self.stats["throttled"] += 1
+                return True
+            self.calls.append(now)
+            return False
+
+    def method(self, name, params):
+        """Результат метода или исключение (code, message)"""
+        with self.lock:
+            self.stats["methods"] += 1
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats["injected_errors"] += 1
+                raise FakeError(10, "Internal server error")
+
+        if name == "groups.get":
+            items = [{"id": 1000 + i, "name": f"Сообщество {i}",
+                      "photo_100": f"{self.base_url}/avatar/{i}.jpg"} for i in range(self.groups)]
+            return {"count": len(items), "items": items}
+        if name == "market.getCategories":
+            return {"count": 3, "items": [{"id": 1, "name": "Одежда"}, {"id": 2, "name": "Обувь"},
+                                          {"id": 3, "name": "Другое"}]}
+        if name == "photos.getMarketUploadServer":
+            return {"upload_url": f"{self.base_url}/upload"}
+        if name == "photos.saveMarketPhoto":
+            return [{"id": self.new_id(), "owner_id": -1}]
+        if name == "market.add":
+            if len(str(params.get("name", ""))) < 4:
+                raise FakeError(100, "One of the parameters specified was missing or invalid: "
+                                     "name should be at least 4 letters")
+            item_id = self.new_id()
+            with self.lock:
+                self.items[item_id] = dict(params, id=item_id)
+            return {"market_item_id": item_id}
+        if name == "market.edit":
+            with self.lock:
+                item = self.items.get(int(params.get("item_id", 0)))
+                if item is None:
+                    raise FakeError(1403, "Item not found")
+                item.update(params)
+            return 1
+        if name == "market.delete":
+            with self.lock:
+                self.items.pop(int(params.get("item_id", 0)), None)
+            return 1
+        if name == "market.addAlbum":
+            album_id = self.new_id()
+            with self.lock:
+                self.albums[album_id] = {"title": params.get("title", ""), "items": []}
+            return {"market_album_id": album_id}
+        if name == "market.addToAlbum":
+            with self.lock:
+                album = self.albums.get(int(params.get("album_ids", 0)))
+                if album is None:
+                    raise FakeError(100, "Album not found")
+                album["items"].extend(int(item_id) for item_id in str(params.get("item_ids", "")).split(","))
+            return 1
+        if name == "market.get":
+            offset, count = int(params.get("offset", 0)), int(params.get("count", 100))
+            with self.lock:
+                items = list(self.items.values())
+            page = [{"id": item["id"], "name": item.get("name", ""), "description": item.get("description", ""),
+                     "sku": item.get("sku", ""), "stock_amount": int(item.get("stock_amount", 0) or 0),
+                     "category": {"id": int(item.get("category_id", 0) or 0)},
+                     "price": {"amount": str(int(round(float(item.get("price", 0)) * 100)))}}
+                    for item in items[offset:offset + count]]
+            return {"count": len(items), "items": page}
+        raise FakeError(3, f"Unknown method passed: {name}")
+
+
+class FakeError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Handler(BaseHTTPRequestHandler):
+    vk = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data):
+        self.send_bytes(json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def send_bytes(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith("/photo/") or path.startswith("/avatar/"):
+            self.vk.sleep(self.vk.upload_latency)
+            with self.vk.lock:
+                if self.vk.photo is None:
+                    self.vk.photo = make_photo(self.vk.photo_size)
+            # У каждого URL свои байты, чтобы разные фото не склеивались по хэшу
+            self.send_bytes(self.vk.photo + path.encode("utf-8"), "image/jpeg")
+            return
+        if path.startswith("/method/"):
+            params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            self.handle_method(path[len("/method/"):], params)
+            return
+        self.send_error(404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_body()
+        if path == "/upload":
+            self.vk.sleep(self.vk.upload_latency)
+            with self.vk.lock:
+                self.vk.stats["uploads"] += 1
+                self.vk.stats["upload_bytes"] += len(body)
+            self.send_json({"server": 1, "photo": json.dumps([{"photo": "fake"}]), "hash": "fakehash"})
+            return
+        if path.startswith("/method/"):
+            params = {key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()}
+            self.handle_method(path[len("/method/"):], params)
+            return
+        self.send_error(404)
+
+    def handle_method(self, name, params):
+        # Лимит считается по времени прихода запроса, задержка — уже на ответ
+        throttled = self.vk.throttled()
+        self.vk.sleep(self.vk.latency)
+        if throttled:
+            self.send_json({"error": {"error_code": 6, "error_msg": "Too many requests per second"}})
+            return
+
+        if name != "execute":
+            try:
+                self.send_json({"response": self.vk.method(name, params)})
+            except FakeError as e:
+                self.send_json({"error": {"error_code": e.code, "error_msg": e.message}})
+            return
+
+        results, errors = [], []
+        for method, sub_params in parse_execute(params.get("code", "")):
+            try:
+                results.append(self.vk.method(method, sub_params))
+            except FakeError as e:
+                results.append(False)
+                errors.append({"method": method, "error_code": e.code, "error_msg": e.message})
+        response = {"response": results}
+        if errors:
+            response["execute_errors"] = errors
+        self.send_json(response)
+
+
+def start_server(vk, host="127.0.0.1", port=0):
+    """Запускаем сервер в фоновом потоке; возвращает (server, base_url)"""
+    handler = type("FakeVkHandler", (Handler,), {"vk": vk})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    vk.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, vk.base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый VK API для замеров")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа API, с")
+    parser.add_argument("--upload-latency", type=float, default=0.1, help="Задержка загрузки/скачивания фото, с")
+    parser.add_argument("--rps", type=int, default=3, help="Лимит запросов в секунду (0 — без лимита)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля вызовов с ошибкой 10")
+    args = parser.parse_args()
+
+    vk = FakeVk(latency=args.latency, upload_latency=args.upload_latency, rps=args.rps, error_rate=args.error_rate)
+    server, base_url = start_server(vk, port=args.port)
+    print(f"API: {base_url}/method/  (Ctrl+C — остановить)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
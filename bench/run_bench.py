@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# bench/run_bench.py
+
+"""Замер скорости загрузки на фейковом VK API (bench/fake_vk.py).
+
+Гоняет тот же конвейер, что и приложение: prepare_items -> ProductUploader,
+на синтетических каталогах и печатает товаров/с, p50/p99 времени на товар
+и пиковую память.
+
+    python bench/run_bench.py --rows 100 1000 10000
+    python bench/run_bench.py --rows 1000 --photo-ratio 0.5 --error-rate 0.01 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from fake_vk import FakeVk, start_server
+from table_io import prepare_items
+from uploader import ProductUploader
+from vk_api import VkApi, AdaptiveRateLimiter, API_REQUESTS_PER_SECOND, RATE_MARGIN
+
+
+def make_catalog(rows, photo_ratio, unique_photos, base_url):
+    """Синтетический каталог в виде DataFrame, как после разбора вставленной таблицы"""
+    # Фото у каждой строки, где целая часть i * photo_ratio растёт, — ровно нужная доля
+    photos = [f"{base_url}/photo/{i % unique_photos}.jpg" if int((i + 1) * photo_ratio) > int(i * photo_ratio)
+              else "" for i in range(rows)]
+    return pd.DataFrame({
+        "Наименование": [f"Тестовый товар {i}" for i in range(rows)],
+        "Описание": [f"Описание тестового товара номер {i}" for i in range(rows)],
+        "Цена": [100 + i % 900 for i in range(rows)],
+        "Остаток": [i % 50 for i in range(rows)],
+        "Фото": photos,
+    })
+
+
+COLUMN_TYPES = {0: "Название", 1: "Описание", 2: "Цена", 3: "Количество", 4: "Фото"}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_case(rows, args):
+    # Кэши и журналы — в своей временной папке, чтобы не трогать настоящие и не делить между замерами
+    os.chdir(tempfile.mkdtemp(prefix="vk-bench-"))
+
+    vk = FakeVk(latency=args.latency, upload_latency=args.upload_latency, rps=args.rps,
+                error_rate=args.error_rate, photo_size=args.photo_size)
+    server, base_url = start_server(vk)
+    try:
+        df = make_catalog(rows, args.photo_ratio, args.unique_photos, base_url)
+
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+
+        items, rejected = prepare_items(df, COLUMN_TYPES, "Бенчмарк")
+        prepared = time.perf_counter()
+
+        api = VkApi("fake-token", limiter=AdaptiveRateLimiter(rate=args.client_rps), api_url=f"{base_url}/method/")
+        uploader = ProductUploader(api, 1, 1)
+
+        # Время на каждый товар — от начала его обработки до результата
+        latencies = []
+        latencies_lock = threading.Lock()
+        upload_item = uploader.upload_item
+
+        def timed_upload_item(item):
+            item_started = time.perf_counter()
+            result = upload_item(item)
+            with latencies_lock:
+                latencies.append(time.perf_counter() - item_started)
+            return result
+
+        uploader.upload_item = timed_upload_item
+        results = uploader.upload(items)
+        finished = time.perf_counter()
+
+        peak = None
+        if args.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    upload_seconds = finished - prepared
+    return {
+        "rows": rows,
+        "items": len(items),
+        "rejected": len(rejected),
+        "failed": sum(1 for result in results if result["error"]),
+        "prepare_seconds": round(prepared - started, 4),
+        "upload_seconds": round(upload_seconds, 3),
+        "items_per_second": round(len(items) / upload_seconds, 2) if upload_seconds else 0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "peak_memory_mb": round(peak / 1024 / 1024, 1) if peak is not None else None,
+        "api_requests": vk.stats["requests"],
+        "api_methods": vk.stats["methods"],
+        "throttled": vk.stats["throttled"],
+        "retries": api.retries,
+        "uploads": vk.stats["uploads"],
+        "upload_mb": round(vk.stats["upload_bytes"] / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер загрузки товаров на фейковом VK API")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="Размеры каталогов")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа API, с")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Задержка загрузки/скачивания фото, с")
+    parser.add_argument("--rps", type=int, default=3, help="Лимит запросов в секунду на стороне сервера")
+    parser.add_argument("--client-rps", type=float, default=API_REQUESTS_PER_SECOND * RATE_MARGIN,
+                        help="Темп лимитера клиента")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля вызовов с ошибкой 10")
+    parser.add_argument("--photo-ratio", type=float, default=0.0, help="Доля товаров с фото")
+    parser.add_argument("--unique-photos", type=int, default=50, help="Сколько разных фото в каталоге")
+    parser.add_argument("--photo-size", type=int, default=200 * 1024, help="Размер фото, байт")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Не считать пиковую память (tracemalloc замедляет замер)")
+    parser.add_argument("--json", help="Куда сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    results = []
+    print(f"{'строк':>8} {'товар/с':>9} {'p50, мс':>9} {'p99, мс':>9} {'память, МБ':>11} "
+          f"{'запросов':>9} {'повторов':>9} {'ошибок':>7}")
+    for rows in args.rows:
+        result = run_case(rows, args)
+        results.append(result)
+        memory = "-" if result["peak_memory_mb"] is None else result["peak_memory_mb"]
+        print(f"{result['rows']:>8} {result['items_per_second']:>9} {result['p50_ms']:>9} {result['p99_ms']:>9} "
+              f"{memory:>11} {result['api_requests']:>9} {result['retries']:>9} {result['failed']:>7}", flush=True)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
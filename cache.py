@@ -0,0 +1,202 @@
+# cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = "cache"
+
+# Размер кэша скачанных фото по умолчанию — 1 ГБ
+PHOTO_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Пережатые фото (ключ — хэш исходного фото) — до 1 ГБ
+PREPARED_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Аватарки сообществ: храним неделю, не больше 50 МБ
+AVATAR_CACHE_MAX_BYTES = 50 * 1024 * 1024
+AVATAR_CACHE_TTL = 7 * 24 * 3600
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def load_json(path, default):
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return default
+
+
+def save_json(path, data):
+    """Пишем во временный файл и подменяем — файл не бьётся при падении"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class DiskCache:
+    """Кэш байтов на диске по хэшу содержимого с вытеснением давно не читанных (LRU).
+
+    С ttl записи старше ttl секунд считаются отсутствующими; время доступа тогда
+    не обновляется, и первыми вытесняются самые старые записи.
+    """
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # hash -> [размер, время последнего доступа]
+        self.entries = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if len(name) == 64 and os.path.isfile(path):
+                stat = os.stat(path)
+                self.entries[name] = [stat.st_size, stat.st_mtime]
+        self.total = sum(size for size, _ in self.entries.values())
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest)
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry[1] > self.ttl:
+                self._remove(digest)
+                return None
+            try:
+                with open(self._path(digest), "rb") as f:
+                    data = f.read()
+                if self.ttl is None:
+                    os.utime(self._path(digest))
+                    entry[1] = os.path.getmtime(self._path(digest))
+            except OSError:
+                self.total -= entry[0]
+                del self.entries[digest]
+                return None
+            return data
+
+    def put(self, data, key=None):
+        """Сохраняем байты; ключ — хэш содержимого, если не задан явно"""
+        digest = key or content_hash(data)
+        with self.lock:
+            if digest in self.entries:
+                if self.ttl is None:
+                    return digest
+                self._remove(digest)
+            tmp = self._path(digest) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(digest))
+            self.entries[digest] = [len(data), os.path.getmtime(self._path(digest))]
+            self.total += len(data)
+            self._evict()
+        return digest
+
+    def _remove(self, digest):
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            pass
+        self.total -= self.entries.pop(digest)[0]
+
+    def _evict(self):
+        if self.total <= self.max_bytes:
+            return
+        for digest, _ in sorted(self.entries.items(), key=lambda e: e[1][1]):
+            self._remove(digest)
+            if self.total <= self.max_bytes:
+                break
+
+
+class PhotoCache(DiskCache):
+    """Скачанные фото товаров: ищем по URL и по хэшу содержимого"""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "photos"), max_bytes=PHOTO_CACHE_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+        self.urls_file = os.path.join(directory, "urls.json")
+        self.urls = load_json(self.urls_file, {})
+
+    def get_url(self, url):
+        """Возвращает (hash, bytes) или (None, None), если фото по URL ещё не скачивали"""
+        digest = self.urls.get(url)
+        if digest is None:
+            return None, None
+        data = self.get(digest)
+        if data is None:
+            return None, None
+        return digest, data
+
+    def put_url(self, url, data):
+        digest = self.put(data)
+        with self.lock:
+            self.urls[url] = digest
+        return digest
+
+    def flush(self):
+        with self.lock:
+            # Не храним ссылки на вытесненные файлы
+            self.urls = {url: digest for url, digest in self.urls.items() if digest in self.entries}
+            save_json(self.urls_file, self.urls)
+
+
+class PreparedPhotoCache(DiskCache):
+    """Фото после пережатия по хэшу исходного: в другое сообщество не пережимаем заново"""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "prepared"), max_bytes=PREPARED_CACHE_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+
+
+class ThumbnailCache(DiskCache):
+    """Аватарки сообществ по URL со сроком жизни"""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "avatars"), max_bytes=AVATAR_CACHE_MAX_BYTES,
+                 ttl=AVATAR_CACHE_TTL):
+        super().__init__(directory, max_bytes, ttl)
+
+    def get_url(self, url):
+        return self.get(url_key(url))
+
+    def put_url(self, url, data):
+        return self.put(data, key=url_key(url))
+
+
+class PhotoIdStore:
+    """Какой photo_id VK выдал для фото с данным хэшем в каждом сообществе"""
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "photo_ids.json")):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.data = load_json(path, {})
+
+    def get(self, group_id, digest):
+        with self.lock:
+            return self.data.get(str(group_id), {}).get(digest)
+
+    def set(self, group_id, digest, photo_id):
+        with self.lock:
+            self.data.setdefault(str(group_id), {})[digest] = photo_id
+
+    def forget(self, group_id, digest):
+        with self.lock:
+            self.data.get(str(group_id), {}).pop(digest, None)
+
+    def flush(self):
+        with self.lock:
+            save_json(self.path, self.data)
@@ -0,0 +1,188 @@
+# catalog_sync.py
+
+from vk_api import ExecuteBatcher, VkApiError
+
+# market.get отдаёт не больше 200 товаров за вызов
+MARKET_PAGE_SIZE = 200
+
+# Страниц с extended-полями в одном execute — ответ из 25 страниц слишком велик
+PAGES_PER_EXECUTE = 5
+
+
+def fetch_market_items(api, group_id):
+    """Все товары сообщества: первая страница напрямую, остальные пачками через execute"""
+    owner_id = f"-{abs(group_id)}"
+    first = api.call("market.get", owner_id=owner_id, count=MARKET_PAGE_SIZE, offset=0, extended=1)
+    items = list(first.get("items", []))
+
+    offsets = range(MARKET_PAGE_SIZE, first.get("count", 0), MARKET_PAGE_SIZE)
+    if offsets:
+        batcher = ExecuteBatcher(api, batch_size=PAGES_PER_EXECUTE)
+        try:
+            futures = [batcher.submit("market.get", owner_id=owner_id, count=MARKET_PAGE_SIZE,
+                                      offset=offset, extended=1) for offset in offsets]
+            for future in futures:
+                items.extend(future.result().get("items", []))
+        finally:
+            batcher.close()
+    return items
+
+
+def market_price(market_item):
+    """Цена товара VK в рублях (amount приходит в копейках строкой)"""
+    try:
+        return round(int(market_item["price"]["amount"]) / 100, 2)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def item_key(item, key):
+    value = item.get(key) or ""
+    return str(value).strip().lower()
+
+
+def diff_catalog(items, existing, key="name"):
+    """Сравниваем строки таблицы с товарами сообщества по названию или артикулу.
+
+    Возвращает план: что добавить, что изменить (item_id, строка), что удалить
+    (товары сообщества, которых нет в таблице) и сколько строк не изменилось.
+    Строку без артикула ищем по названию — иначе она стала бы новым товаром,
+    а её же товар попал бы в удаление.
+    """
+    indexes = {"name": {}, "sku": {}}
+    for market_item in existing:
+        for field, index in indexes.items():
+            k = item_key(market_item, field)
+            if k:
+                index.setdefault(k, market_item)
+
+    plan = {"add": [], "edit": [], "delete": [], "unchanged": 0}
+    seen = set()
+    for item in items:
+        field = key if item_key(item, key) else "name"
+        market_item = indexes[field].get(item_key(item, field))
+        if market_item is None:
+            plan["add"].append(item)
+            continue
+        seen.add(market_item["id"])
+        if (market_item.get("name", "") != item["name"]
+                or market_item.get("description", "") != item["description"]
+                or market_price(market_item) != round(item["price"], 2)
+                or ("stock_amount" in item and market_item.get("stock_amount") != item["stock_amount"])):
+            plan["edit"].append((market_item["id"], item))
+        else:
+            plan["unchanged"] += 1
+
+    plan["delete"] = [market_item["id"] for market_item in existing if market_item["id"] not in seen]
+    return plan
+
+
+def refresh_index(api, group_id, index):
+    """Пересобираем индекс товаров по market.get"""
+    index.rebuild(fetch_market_items(api, group_id), market_price)
+    index.flush()
+
+
+def plan_stock_update(items, index, key="name"):
+    """Быстрый путь для цен и остатков: только строки, у которых они изменились.
+
+    item_id берём из локального индекса, без запроса к VK. Возвращает план для
+    CatalogSync.apply (без add и delete), а также число строк без изменений и
+    строки, которых нет в индексе.
+    """
+    plan = {"add": [], "edit": [], "delete": [], "unchanged": 0, "missing": []}
+    seen = set()
+    for item in items:
+        item_id, record = index.find(item, key)
+        if item_id is None or item_id in seen:
+            plan["missing"].append(item)
+            continue
+        seen.add(item_id)
+        if (record.get("price") == round(item["price"], 2)
+                and ("stock_amount" not in item or record.get("stock") == item["stock_amount"])):
+            plan["unchanged"] += 1
+            continue
+        # Имя и описание market.edit требует всегда; категорию берём из индекса, если в строке её нет
+        if not item.get("category_id") and record.get("category_id"):
+            item = dict(item, category_id=record["category_id"])
+        plan["edit"].append((item_id, item))
+    return plan
+
+
+class CatalogSync:
+    """Отправляет только нужные market.add / market.edit / market.delete"""
+
+    def __init__(self, uploader):
+        self.uploader = uploader
+
+    def edit_item(self, task):
+        item_id, item = task
+        result = {"item": item, "item_id": item_id, "photo_id": None, "photo_error": None, "error": None,
+                  "skipped": False, "action": "edit"}
+        params = {
+            "owner_id": f"-{self.uploader.group_id}",
+            "item_id": item_id,
+            "name": item["name"],
+            "description": item["description"],
+            "category_id": item.get("category_id") or self.uploader.category_id,
+            "price": item["price"]
+        }
+        if item.get("sku"):
+            params["sku"] = item["sku"]
+        if "stock_amount" in item:
+            params["stock_amount"] = item["stock_amount"]
+        self.uploader.metrics.count("api_calls")
+        try:
+            with self.uploader.metrics.stage("market_edit"):
+                self.uploader.batcher.call("market.edit", **params)
+            if self.uploader.item_index is not None:
+                self.uploader.item_index.record(item_id, item, params["category_id"])
+        except VkApiError as e:
+            result["error"] = e.message
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    def delete_item(self, item_id):
+        result = {"item": {"name": f"#{item_id}"}, "item_id": item_id, "photo_id": None, "photo_error": None,
+                  "error": None, "skipped": False, "action": "delete"}
+        self.uploader.metrics.count("api_calls")
+        try:
+            self.uploader.batcher.call("market.delete", owner_id=f"-{self.uploader.group_id}", item_id=item_id)
+            if self.uploader.item_index is not None:
+                self.uploader.item_index.forget(item_id)
+            if self.uploader.journal:
+                # Иначе строка этого товара так и числилась бы загруженной
+                self.uploader.journal.forget_item(item_id)
+        except VkApiError as e:
+            result["error"] = e.message
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    def apply(self, plan, on_result=None, should_cancel=None, delete=False):
+        """Выполняем план и закрываем загрузчик.
+
+        Что добавлять, решил diff, поэтому журнал здесь строк не пропускает:
+        товар, удалённый из магазина, по журналу мог числиться загруженным.
+        """
+        results = []
+
+        def cancelled():
+            return should_cancel is not None and should_cancel()
+
+        def on_add(done, result):
+            result["action"] = "add"
+            results.append(result)
+            if on_result:
+                on_result(len(results), result)
+
+        try:
+            self.uploader.add_items(plan["add"], on_add, should_cancel, resume=False)
+            if not cancelled():
+                self.uploader.run(plan["edit"], self.edit_item, on_result, should_cancel, results)
+            if delete and not cancelled():
+                self.uploader.run(plan["delete"], self.delete_item, on_result, should_cancel, results)
+        finally:
+            self.uploader.close()
+        return results
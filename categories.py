@@ -0,0 +1,58 @@
+# categories.py
+
+import os
+import time
+
+from cache import CACHE_DIR, load_json, save_json
+
+CATEGORY_CACHE_FILE = os.path.join(CACHE_DIR, "categories.json")
+
+# Список категорий VK общий для всех сообществ и меняется редко
+CATEGORY_CACHE_TTL = 24 * 3600
+
+# market.getCategories отдаёт не больше 1000 категорий за вызов
+MAX_CATEGORIES = 1000
+
+
+def load_categories(api, refresh=False, path=CATEGORY_CACHE_FILE, ttl=CATEGORY_CACHE_TTL):
+    """Категории товаров VK: из файла, если он моложе ttl, иначе из API с сохранением.
+
+    Если API недоступен, лучше устаревший список, чем никакого.
+    """
+    cached = load_json(path, None)
+    if not refresh and cached and time.time() - cached.get("saved_at", 0) < ttl:
+        return cached["items"]
+
+    try:
+        response = api.call("market.getCategories", count=MAX_CATEGORIES)
+    except Exception:
+        if cached:
+            return cached["items"]
+        raise
+    items = [{"id": category["id"], "name": category["name"]} for category in response.get("items", [])]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    save_json(path, {"saved_at": time.time(), "items": items})
+    return items
+
+
+def normalize(name):
+    return " ".join(str(name).split()).lower()
+
+
+class CategoryIndex:
+    """Категория по названию без учёта регистра и лишних пробелов или по её id"""
+
+    def __init__(self, categories):
+        self.by_name = {}
+        self.ids = set()
+        for category in categories:
+            # Одинаковые названия в разных разделах — берём первое
+            self.by_name.setdefault(normalize(category["name"]), category["id"])
+            self.ids.add(category["id"])
+
+    def resolve(self, value):
+        """id категории или None, если такой нет"""
+        key = normalize(value)
+        if key.isdigit():
+            return int(key) if int(key) in self.ids else None
+        return self.by_name.get(key)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# cli.py
+
+"""Загрузка товаров без окна: для запуска по расписанию (cron) на сервере.
+
+Пример:
+    python cli.py --group-id 123456 --file goods.csv --category-id 1 \\
+        --map Наименование=Название --map Описание=Описание --map 3=Цена --map Картинка=Фото
+
+Цены и остатки уже загруженных товаров (несколько раз в день):
+    python cli.py --group-id 123456 --file stock.csv --category-id 1 --stock-only \\
+        --map Наименование=Название --map Описание=Описание --map Цена=Цена --map Остаток=Количество
+
+Прогресс печатается в stdout строками JSON, по одной на событие.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from user_data import load_user_data
+
+# Поля товара по-английски — для удобства в скриптах
+FIELD_ALIASES = {
+    "name": "Название",
+    "description": "Описание",
+    "price": "Цена",
+    "quantity": "Количество",
+    "photo": "Фото",
+    "sku": "Артикул",
+    "category": "Категория",
+}
+
+
+def emit(event, **data):
+    print(json.dumps({"event": event, **data}, ensure_ascii=False), flush=True)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Загрузка товаров в сообщество VK без графического интерфейса")
+    parser.add_argument("--group-id", type=int, required=True, help="ID сообщества")
+    parser.add_argument("--file", required=True, help="Таблица CSV/TSV/XLSX")
+    parser.add_argument("--map", action="append", default=[], metavar="СТОЛБЕЦ=ТИП",
+                        help="Тип столбца: номер с 0 или заголовок = "
+                             "Название/Описание/Цена/Количество/Фото/Артикул/Категория")
+    parser.add_argument("--category-id", type=int, required=True,
+                        help="ID категории товаров (для строк с пустой ячейкой категории)")
+    parser.add_argument("--category-name", default="", help="Название категории (для журнала загрузки)")
+    parser.add_argument("--token", help="Токен доступа; по умолчанию берётся из user_data.json")
+    parser.add_argument("--album", help="Создать подборку с таким названием и добавить товары в неё")
+    parser.add_argument("--no-journal", action="store_true", help="Не пропускать уже загруженные строки")
+    parser.add_argument("--stock-only", action="store_true",
+                        help="Только обновить цены и остатки уже загруженных товаров (без фото и новых товаров)")
+    return parser.parse_args(argv)
+
+
+def parse_mapping(mapping, columns):
+    """--map в словарь {номер столбца: тип}, как column_types в окне таблицы"""
+    from table_io import COLUMN_FIELDS
+
+    column_types = {}
+    for entry in mapping:
+        column, sep, column_type = entry.rpartition("=")
+        if not sep:
+            raise ValueError(f"Неверный формат --map: {entry}")
+        column_type = FIELD_ALIASES.get(column_type.strip().lower(), column_type.strip())
+        if column_type not in COLUMN_FIELDS:
+            raise ValueError(f"Неизвестный тип столбца: {column_type}")
+
+        column = column.strip()
+        if column in columns:
+            index = columns.index(column)
+        elif column.isdigit() and int(column) < len(columns):
+            index = int(column)
+        else:
+            raise ValueError(f"Нет такого столбца: {column}")
+        column_types[index] = column_type
+    return column_types
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    token = args.token or (load_user_data() or {}).get("access_token")
+    if not token:
+        emit("error", message="Нет токена: передайте --token или авторизуйтесь в приложении")
+        return 2
+
+    # pandas загружается только здесь, после разбора аргументов
+    from table_io import read_table_preview, iter_file_items, missing_columns
+    from vk_api import VkApi
+    from uploader import ProductUploader
+    from journal import UploadJournal
+    from item_index import ItemIndex
+    from catalog_sync import CatalogSync, plan_stock_update, refresh_index
+    from categories import load_categories, CategoryIndex
+
+    try:
+        preview = read_table_preview(args.file, rows=1)
+        if preview is None:
+            raise ValueError("Файл пустой")
+        column_types = parse_mapping(args.map, [str(column) for column in preview.columns])
+    except (OSError, ValueError) as e:
+        emit("error", message=str(e))
+        return 2
+
+    missing = missing_columns(column_types)
+    if missing:
+        emit("error", message=f"Не выбраны обязательные поля: {', '.join(missing)}")
+        return 2
+
+    api = VkApi(token)
+    categories = None
+    if "Категория" in column_types.values():
+        try:
+            categories = CategoryIndex(load_categories(api))
+        except Exception as e:
+            emit("error", message=f"Не удалось получить категории: {str(e)}")
+            return 2
+
+    journal = None if args.no_journal or args.stock_only else UploadJournal.for_group(args.group_id)
+    uploader = ProductUploader(api, args.group_id, args.category_id, journal=journal, album=args.album,
+                               item_index=ItemIndex.for_group(args.group_id))
+
+    rejected = []
+    counts = {"done": 0, "added": 0, "edited": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+
+    def on_result(done, result):
+        counts["done"] = done
+        if result["skipped"]:
+            counts["skipped"] += 1
+        elif result["error"]:
+            counts["failed"] += 1
+        elif result.get("action") == "edit":
+            counts["edited"] += 1
+        else:
+            counts["added"] += 1
+        emit("item", done=done, name=result["item"]["name"], item_id=result["item_id"],
+             skipped=result["skipped"], error=result["error"], photo_error=result["photo_error"])
+
+    items = iter_file_items(args.file, column_types, args.category_name, rejected, categories=categories)
+    try:
+        if args.stock_only:
+            items = list(items)
+            key = "sku" if "Артикул" in column_types.values() else "name"
+            plan = plan_stock_update(items, uploader.item_index, key)
+            if plan["missing"]:
+                refresh_index(api, args.group_id, uploader.item_index)
+                plan = plan_stock_update(items, uploader.item_index, key)
+            for item in plan["missing"]:
+                emit("missing", name=item["name"])
+            counts["unchanged"] = plan["unchanged"]
+            counts["missing"] = len(plan["missing"])
+            CatalogSync(uploader).apply(plan, on_result)
+        else:
+            uploader.upload(items, on_result=on_result, collect=False)
+    except KeyboardInterrupt:
+        emit("interrupted", **counts)
+        return 130
+
+    for row, reason in rejected:
+        emit("rejected", row=row, reason=reason)
+
+    elapsed = time.monotonic() - started
+    try:
+        metrics_path = uploader.metrics.dump()
+    except OSError:
+        metrics_path = None
+    emit("summary", **counts, rejected=len(rejected), retries=api.retries, seconds=round(elapsed, 2),
+         items_per_second=round(counts["done"] / elapsed, 2) if elapsed else 0, metrics=metrics_path,
+         stages=uploader.metrics.to_dict()["stages"])
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
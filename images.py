@@ -0,0 +1,47 @@
+# images.py
+
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Ограничения VK для фото товара: не меньше 400x400, сумма сторон не больше 14000.
+# Больше 2000 px по длинной стороне витрине не нужно, а весит такое фото в разы больше.
+MIN_SIDE = 400
+MAX_SIDE = 2000
+MAX_SIDES_SUM = 14000
+JPEG_QUALITY = 85
+
+
+def prepare_photo(data):
+    """Приводим фото к требованиям VK и пережимаем в JPEG.
+
+    Выполняется в отдельном процессе. Без Pillow возвращает байты как есть.
+    """
+    if Image is None:
+        return data
+
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+
+    # Прозрачность заливаем белым — JPEG её не поддерживает
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    width, height = image.size
+    scale = min(1.0, MAX_SIDE / max(width, height), MAX_SIDES_SUM / (width + height))
+    scale = max(scale, MIN_SIDE / min(width, height))
+    if scale != 1.0:
+        image = image.resize((max(MIN_SIDE, round(width * scale)), max(MIN_SIDE, round(height * scale))),
+                             Image.LANCZOS)
+
+    out = BytesIO()
+    image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
@@ -0,0 +1,100 @@
+# item_index.py
+
+import os
+import threading
+
+from cache import CACHE_DIR, load_json, save_json
+
+ITEM_INDEX_DIR = os.path.join(CACHE_DIR, "items")
+
+
+def index_key(value):
+    return str(value or "").strip().lower()
+
+
+class ItemIndex:
+    """Товары сообщества, которые мы знаем: item_id -> название, артикул, цена, остаток, категория.
+
+    По нему строки таблицы находят свой item_id без запроса к VK. Пополняется
+    при загрузке и изменении товаров и пересобирается из market.get.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.items = {int(item_id): record for item_id, record in load_json(path, {}).items()}
+        self.keys = {"name": {}, "sku": {}}
+        for item_id, record in self.items.items():
+            self._add_keys(item_id, record)
+
+    @classmethod
+    def for_group(cls, group_id):
+        return cls(os.path.join(ITEM_INDEX_DIR, f"{abs(group_id)}.json"))
+
+    def _add_keys(self, item_id, record):
+        # Последний записанный товар с таким названием или артикулом и есть нужный
+        for key in ("name", "sku"):
+            value = index_key(record.get(key))
+            if value:
+                self.keys[key][value] = item_id
+
+    def _drop_keys(self, item_id, record):
+        for key in ("name", "sku"):
+            value = index_key(record.get(key))
+            if self.keys[key].get(value) == item_id:
+                del self.keys[key][value]
+
+    def __len__(self):
+        return len(self.items)
+
+    def find(self, item, key="name"):
+        """(item_id, запись) для строки таблицы или (None, None); строку без артикула ищем по названию"""
+        if not index_key(item.get(key)):
+            key = "name"
+        with self.lock:
+            item_id = self.keys[key].get(index_key(item.get(key)))
+            record = self.items.get(item_id)
+            return (item_id, record) if record is not None else (None, None)
+
+    def record(self, item_id, item, category_id=None):
+        """Запоминаем состояние товара после market.add / market.edit"""
+        with self.lock:
+            old = self.items.get(item_id, {})
+            record = {
+                "name": item["name"],
+                "sku": item.get("sku", ""),
+                "price": round(item["price"], 2),
+                "stock": item.get("stock_amount", old.get("stock")),
+                "category_id": item.get("category_id") or category_id or old.get("category_id"),
+            }
+            # Товар могли переименовать через market.edit — старое название больше не его
+            self._drop_keys(item_id, old)
+            self.items[item_id] = record
+            self._add_keys(item_id, record)
+
+    def forget(self, item_id):
+        with self.lock:
+            record = self.items.pop(item_id, None)
+            if record is not None:
+                self._drop_keys(item_id, record)
+
+    def rebuild(self, market_items, price):
+        """Заменяем индекс товарами из market.get; price(market_item) — цена в рублях"""
+        with self.lock:
+            self.items = {}
+            self.keys = {"name": {}, "sku": {}}
+            for market_item in market_items:
+                record = {
+                    "name": market_item.get("name", ""),
+                    "sku": market_item.get("sku", ""),
+                    "price": price(market_item),
+                    "stock": market_item.get("stock_amount"),
+                    "category_id": (market_item.get("category") or {}).get("id"),
+                }
+                self.items[market_item["id"]] = record
+                self._add_keys(market_item["id"], record)
+
+    def flush(self):
+        with self.lock:
+            save_json(self.path, {str(item_id): record for item_id, record in self.items.items()})
@@ -0,0 +1,102 @@
+# journal.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cache import CACHE_DIR
+
+JOURNAL_DIR = os.path.join(CACHE_DIR, "journal")
+
+# fsync не на каждую запись, а раз в столько записей или секунд
+FSYNC_EVERY_RECORDS = 50
+FSYNC_EVERY_SECONDS = 2.0
+
+ROW_FIELDS = ("name", "description", "price", "quantity", "photo_url", "sku", "category")
+
+
+def row_hash(item):
+    """Стабильный ключ строки: одинаковые данные дают одинаковый хэш между запусками"""
+    key = json.dumps([str(item.get(field, "")) for field in ROW_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class UploadJournal:
+    """Журнал загрузки (только дозапись): для каждой строки — статус, photo_id и item_id.
+
+    Каждая запись — одна строка JSON. Оборванная при падении последняя строка
+    при чтении пропускается, поэтому журнал не ломается.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        # item_id созданного товара -> ключ строки, из которой он создан
+        self.rows_by_item = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._remember(record)
+
+        self.file = open(path, "a", encoding="utf-8")
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    @classmethod
+    def for_group(cls, group_id):
+        return cls(os.path.join(JOURNAL_DIR, f"{abs(group_id)}.jsonl"))
+
+    def completed(self, item):
+        """Запись об уже созданном товаре или None"""
+        record = self.records.get(row_hash(item))
+        if record and record["status"] == "done":
+            return record
+        return None
+
+    def _remember(self, record):
+        self.records[record["row"]] = record
+        if record["status"] == "done" and record.get("item_id"):
+            self.rows_by_item[record["item_id"]] = record["row"]
+
+    def record(self, item, status, photo_id=None, item_id=None, error=None):
+        self._write({"row": row_hash(item), "status": status, "photo_id": photo_id,
+                     "item_id": item_id, "error": error, "time": int(time.time())})
+
+    def forget_item(self, item_id):
+        """Товар удалён из магазина: строку, из которой он создан, снова можно загружать"""
+        with self.lock:
+            row = self.rows_by_item.pop(item_id, None)
+        if row is not None:
+            self._write({"row": row, "status": "deleted", "photo_id": None,
+                         "item_id": item_id, "error": None, "time": int(time.time())})
+
+    def _write(self, record):
+        with self.lock:
+            self._remember(record)
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self.unsynced += 1
+            if (self.unsynced >= FSYNC_EVERY_RECORDS
+                    or time.monotonic() - self.synced_at >= FSYNC_EVERY_SECONDS):
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._sync()
+            self.file.close()
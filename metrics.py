@@ -0,0 +1,221 @@
+# metrics.py
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from cache import CACHE_DIR, save_json
+
+METRICS_DIR = os.path.join(CACHE_DIR, "metrics")
+
+# Сколько последних секунд учитывать в текущей скорости
+RATE_WINDOW = 30.0
+
+# Для процентилей храним не больше стольких замеров на этап
+MAX_SAMPLES = 10000
+
+# Действие с товаром (result["action"]) -> счётчик успешных
+ACTION_COUNTERS = {"add": "items_added", "edit": "items_edited", "delete": "items_deleted"}
+
+
+class StageStats:
+    """Длительности одного этапа: сумма, максимум и выборка для процентилей"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        # Reservoir sampling: выборка остаётся равномерной при любом числе замеров
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            index = random.randrange(self.count)
+            if index < MAX_SAMPLES:
+                self.samples[index] = seconds
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 3),
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 1),
+            "p99_ms": round(self.percentile(0.99) * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+class UploadMetrics:
+    """Замеры загрузки: время по этапам, байты, вызовы API, ошибки и повторы.
+
+    Этапы: download, preprocess, upload_post, save_photo, market_add, market_edit
+    и item (товар целиком). Все методы можно вызывать из рабочих потоков.
+    """
+
+    def __init__(self, api=None):
+        self.api = api
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.finished = None
+        self.stages = {}
+        self.bytes = {}
+        self.counters = {}
+        self.completed = deque()
+
+        # Счётчики клиента VK на момент старта — в отчёт идёт разница
+        self.api_requests_start = api.requests if api else 0
+        self.api_retries_start = api.retries if api else 0
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.stages.setdefault(name, StageStats()).add(seconds)
+
+    def add_bytes(self, name, count):
+        with self.lock:
+            self.bytes[name] = self.bytes.get(name, 0) + count
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def item_done(self, result):
+        now = time.monotonic()
+        with self.lock:
+            self.completed.append(now)
+            while self.completed and now - self.completed[0] > RATE_WINDOW:
+                self.completed.popleft()
+        if result["skipped"]:
+            self.count("items_skipped")
+        elif result["error"]:
+            self.count("items_failed")
+        else:
+            # У результатов загрузки action нет — это добавление
+            self.count(ACTION_COUNTERS[result.get("action", "add")])
+        if result["photo_error"]:
+            self.count("photo_errors")
+
+    def items_per_second(self):
+        """Скорость за последние RATE_WINDOW секунд"""
+        now = time.monotonic()
+        with self.lock:
+            window = min(RATE_WINDOW, now - self.started)
+            count = sum(1 for moment in self.completed if now - moment <= RATE_WINDOW)
+        return count / window if window > 0 else 0.0
+
+    def eta(self, remaining):
+        """Сколько секунд осталось до конца при текущей скорости; None, если неизвестно"""
+        rate = self.items_per_second()
+        return remaining / rate if rate > 0 else None
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def to_dict(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        with self.lock:
+            counters = dict(self.counters)
+            stages = {name: stats.to_dict() for name, stats in self.stages.items()}
+            transferred = dict(self.bytes)
+        done = sum(counters.get(name, 0)
+                   for name in ("items_failed", "items_skipped", *ACTION_COUNTERS.values()))
+        if self.api:
+            counters["api_requests"] = self.api.requests - self.api_requests_start
+            counters["api_retries"] = self.api.retries - self.api_retries_start
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+            "counters": counters,
+            "bytes": transferred,
+            "stages": stages,
+        }
+
+    def to_prometheus(self):
+        data = self.to_dict()
+        lines = [
+            f"vk_upload_elapsed_seconds {data['elapsed_seconds']}",
+            f"vk_upload_items_per_second {data['items_per_second']}",
+        ]
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"vk_upload_{name}_total {value}")
+        for name, value in sorted(data["bytes"].items()):
+            lines.append(f'vk_upload_bytes_total{{stage="{name}"}} {value}')
+        for name, stats in sorted(data["stages"].items()):
+            lines.append(f'vk_upload_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+            lines.append(f'vk_upload_stage_seconds_sum{{stage="{name}"}} {stats["total_seconds"]}')
+            for quantile, key in (("0.5", "p50_ms"), ("0.99", "p99_ms")):
+                lines.append(f'vk_upload_stage_seconds{{stage="{name}",quantile="{quantile}"}} '
+                             f'{stats[key] / 1000}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory=METRICS_DIR):
+        """Пишем отчёт в JSON и в текстовом формате Prometheus; возвращает путь к JSON"""
+        os.makedirs(directory, exist_ok=True)
+        name = "upload-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        path = os.path.join(directory, name + ".json")
+        save_json(path, self.to_dict())
+        with open(os.path.join(directory, name + ".prom"), "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        return path
+
+
+class StartupTimer:
+    """Сколько прошло от запуска приложения до ключевых моментов: импорты, окно, первый кадр"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.started_at = time.time() - (time.perf_counter() - self.started)
+        self.marks = {}
+
+    def mark(self, name):
+        """Отмечаем момент; False, если такой уже отмечен (считается только первый)"""
+        if name in self.marks:
+            return False
+        self.marks[name] = round(time.perf_counter() - self.started, 3)
+        return True
+
+    def report(self):
+        return "Запуск: " + ", ".join(f"{name} {seconds:.2f} с" for name, seconds in self.marks.items())
+
+    def dump(self, directory=METRICS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "startup.json")
+        save_json(path, {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "marks": self.marks,
+        })
+        return path
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "—"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} ч {seconds % 3600 // 60} мин"
+    if seconds >= 60:
+        return f"{seconds // 60} мин {seconds % 60} с"
+    return f"{seconds} с"
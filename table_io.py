@@ -0,0 +1,273 @@
+# table_io.py
+
+import csv
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from cache import content_hash
+
+# Строк в одном куске при чтении файла
+CHUNK_ROWS = 5000
+
+# Сколько текста смотрим, чтобы угадать разделитель
+SNIFF_BYTES = 64 * 1024
+SNIFF_DELIMITERS = "\t,;|"
+
+# Текстовый столбец становится категориальным, если уникальных значений не больше этой доли
+CATEGORY_MAX_UNIQUE = 0.5
+
+# Сколько последних разобранных таблиц держать в памяти
+PARSE_CACHE_SIZE = 4
+
+TABLE_FILE_FILTER = "Таблицы (*.csv *.tsv *.txt *.xlsx);;Все файлы (*)"
+
+
+def detect_separator(sample):
+    """Разделитель по образцу текста.
+
+    csv.Sniffer сравнивает, как часто символ встречается в каждой строке, и учитывает
+    кавычки, поэтому запятые внутри названий не сбивают его с толку. Если он не
+    справился — берём первый из табуляции, запятой и точки с запятой в первой строке.
+    """
+    # Последняя строка образца может быть обрезана — она бы только мешала
+    if len(sample) >= SNIFF_BYTES and "\n" in sample:
+        sample = sample[:sample.rindex("\n")]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        pass
+    first_line = sample.splitlines()[0] if sample else ""
+    for sep in ['\t', ',', ';']:
+        if sep in first_line:
+            return sep
+    return ','
+
+
+def has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def read_csv_text(raw, sep):
+    """Читаем CSV целиком: через pyarrow, если он установлен, иначе обычным парсером pandas"""
+    if has_pyarrow():
+        try:
+            return pd.read_csv(BytesIO(raw.encode("utf-8")), sep=sep, engine="pyarrow")
+        except Exception:
+            # Что-то, чего не умеет pyarrow (например, одинаковые заголовки) — разберёт pandas
+            pass
+    return pd.read_csv(StringIO(raw), sep=sep)
+
+
+def compact_frame(df):
+    """Ужимаем столбцы: целые — до наименьшего подходящего типа, повторяющиеся строки — в category.
+
+    Дробные числа не трогаем: во float32 цены теряют копейки.
+    """
+    for column in range(df.shape[1]):
+        values = df.iloc[:, column]
+        if pd.api.types.is_integer_dtype(values):
+            compact = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            if len(values) < 2 or values.nunique() > len(values) * CATEGORY_MAX_UNIQUE:
+                continue
+            compact = values.astype("category")
+        else:
+            continue
+        df.isetitem(column, compact)
+    return df
+
+
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def parse_table(raw):
+    """Разбираем вставленный текст таблицы в DataFrame.
+
+    Результат запоминается по хэшу текста: тот же текст повторно не разбирается.
+    Возвращённый DataFrame общий для всех вызовов — его нельзя менять.
+    """
+    key = content_hash(raw.encode("utf-8"))
+    with _parse_cache_lock:
+        df = _parse_cache.get(key)
+        if df is not None:
+            _parse_cache.move_to_end(key)
+            return df
+
+    df = compact_frame(read_csv_text(raw, detect_separator(raw[:SNIFF_BYTES])))
+
+    with _parse_cache_lock:
+        _parse_cache[key] = df
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return df
+
+
+def iter_table_file(path, chunk_rows=CHUNK_ROWS):
+    """Читаем CSV/TSV/XLSX с диска кусками по chunk_rows строк (генератор DataFrame)"""
+    if os.path.splitext(path)[1].lower() == ".xlsx":
+        yield from iter_xlsx(path, chunk_rows)
+        return
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        sample = f.read(SNIFF_BYTES)
+    yield from pd.read_csv(path, sep=detect_separator(sample), encoding="utf-8-sig", chunksize=chunk_rows)
+
+
+def iter_xlsx(path, chunk_rows):
+    # openpyxl в режиме read_only не загружает весь лист в память
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value) if value is not None else f"Столбец {j + 1}" for j, value in enumerate(header)]
+        chunk = []
+        for row in rows:
+            chunk.append(row[:len(columns)])
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_table_preview(path, rows=CHUNK_ROWS):
+    """Первый кусок файла — для предпросмотра и выбора типов столбцов"""
+    df = next(iter_table_file(path, rows), None)
+    return compact_frame(df) if df is not None else None
+
+
+# Тип столбца в таблице -> поле товара
+COLUMN_FIELDS = {
+    "Название": "name",
+    "Описание": "description",
+    "Цена": "price",
+    "Количество": "quantity",
+    "Фото": "photo_url",
+    "Артикул": "sku",
+    "Категория": "category",
+}
+REQUIRED_COLUMNS = ["Название", "Описание", "Цена"]
+
+# Ограничения VK на название товара
+MIN_NAME_LENGTH = 4
+MAX_NAME_LENGTH = 100
+
+# Количество (остаток) у VK — 32-битное целое
+MAX_QUANTITY = 2 ** 31 - 1
+
+
+def missing_columns(column_types):
+    """Обязательные типы столбцов, которые не выбраны"""
+    used = set(column_types.values())
+    return [column for column in REQUIRED_COLUMNS if column not in used]
+
+
+def text_column(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # В категориальный столбец нельзя подставить "", которого нет среди категорий
+        values = values.astype(object)
+    return values.fillna("").astype(str).str.strip()
+
+
+def number_column(values):
+    """Числа вида «1 234,50» тоже считаются числами; всё нечисловое становится NaN"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    cleaned = text_column(values).str.replace(r"[\s ]", "", regex=True).str.replace(",", ".", regex=False)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def prepare_items(df, column_types, category_name, first_row=1, categories=None):
+    """Превращаем DataFrame в товары целыми столбцами и проверяем их.
+
+    Возвращает (items, rejected), где rejected — список (номер строки, причина)
+    для всех строк, не прошедших проверку. first_row — номер первой строки df.
+    Если выбран столбец «Категория», а categories (CategoryIndex) передан, у
+    товаров появляется свой category_id; пустые ячейки — это category_name.
+    Остаток (stock_amount) есть у товаров, только если выбран столбец «Количество».
+    """
+    fields = pd.DataFrame({
+        "name": pd.Series("", index=df.index),
+        "description": pd.Series("", index=df.index),
+        "price": pd.Series(0.0, index=df.index),
+        "quantity": pd.Series(1, index=df.index),
+        "photo_url": pd.Series("", index=df.index),
+        "sku": pd.Series("", index=df.index),
+        "category": pd.Series("", index=df.index),
+    })
+    bad_quantity = pd.Series(False, index=df.index)
+
+    for j, column_type in column_types.items():
+        field = COLUMN_FIELDS.get(column_type)
+        if field is None:
+            continue
+        values = df.iloc[:, j]
+        if field == "price":
+            fields[field] = number_column(values).fillna(0.0)
+        elif field == "quantity":
+            quantity = number_column(values)
+            # inf и числа вне диапазона в int не переводятся — такие строки отклоняем
+            bad_quantity = quantity.notna() & ~(quantity.abs() <= MAX_QUANTITY)
+            fields[field] = quantity.mask(bad_quantity).fillna(1).astype(int)
+        else:
+            fields[field] = text_column(values)
+    has_category = fields["category"] != ""
+    fields["category"] = fields["category"].where(has_category, category_name)
+    if "Количество" in column_types.values():
+        fields["stock_amount"] = fields["quantity"].clip(lower=0)
+
+    name_length = fields["name"].str.len()
+    checks = [
+        (name_length < MIN_NAME_LENGTH, f"Название слишком короткое (мин. {MIN_NAME_LENGTH} символа)"),
+        (name_length > MAX_NAME_LENGTH, f"Название слишком длинное (макс. {MAX_NAME_LENGTH} символов)"),
+        (fields["description"] == "", "Отсутствует описание"),
+        (fields["price"] <= 0, "Цена должна быть больше 0"),
+        # inf и числа вроде 1e400 проходят проверку выше, но VK их не примет
+        (fields["price"].abs() == float("inf"), "Некорректная цена"),
+        (bad_quantity, "Некорректное количество"),
+    ]
+    if categories is not None and has_category.any():
+        # Разных категорий в таблице немного — ищем каждую один раз. У строк с пустой
+        # ячейкой category_id = 0: для них загрузчик берёт категорию, выбранную для всей загрузки
+        names = fields["category"][has_category]
+        category_ids = names.map({name: categories.resolve(name) for name in names.unique()}).reindex(fields.index)
+        checks.append((has_category & category_ids.isna(), "Неизвестная категория VK"))
+        fields["category_id"] = category_ids.fillna(0).astype(int)
+
+    valid = pd.Series(True, index=df.index)
+    rejected = {}
+    for mask, reason in checks:
+        valid &= ~mask
+        for position in mask.to_numpy().nonzero()[0]:
+            rejected.setdefault(first_row + int(position), []).append(reason)
+
+    # tolist() по столбцам заметно быстрее to_dict("records") и сразу даёт типы Python
+    fields = fields[valid.to_numpy()]
+    columns = list(fields.columns)
+    items = [dict(zip(columns, row)) for row in zip(*(fields[column].tolist() for column in columns))]
+    return items, [(row, "; ".join(reasons)) for row, reasons in sorted(rejected.items())]
+
+
+def iter_file_items(path, column_types, category_name, rejected, chunk_rows=CHUNK_ROWS, categories=None):
+    """Товары из файла по мере чтения: каждый кусок сразу проверяется и отдаётся дальше.
+
+    Отклонённые строки дописываются в список rejected.
+    """
+    first_row = 1
+    for chunk in iter_table_file(path, chunk_rows):
+        items, chunk_rejected = prepare_items(chunk, column_types, category_name, first_row, categories)
+        rejected.extend(chunk_rejected)
+        first_row += len(chunk)
+        yield from items
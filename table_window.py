@@ -0,0 +1,789 @@
+# table_window.py
+
+import threading
+
+import pandas as pd
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QPushButton, QLabel, QMessageBox, QDialog, QDialogButtonBox,
+    QComboBox, QTableView, QPlainTextEdit, QHeaderView, QProgressDialog, QFileDialog, QLineEdit
+)
+from PySide6.QtCore import (
+    Qt, QTimer, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, Signal
+)
+
+from vk_api import VkApiError
+from uploader import ProductUploader, MultiGroupUploader
+from journal import UploadJournal
+from catalog_sync import CatalogSync, fetch_market_items, diff_catalog, plan_stock_update, refresh_index
+from item_index import ItemIndex
+from categories import load_categories, CategoryIndex
+from metrics import format_eta
+from table_io import (
+    parse_table, prepare_items, missing_columns, read_table_preview, iter_file_items, TABLE_FILE_FILTER
+)
+
+# Возможные заголовки столбцов для переименования
+HEADER_OPTIONS = ["Не использовать", "Название", "Фото", "Описание", "Цена", "Количество", "Артикул", "Категория",
+                  "Другое"]
+
+# Пауза после последнего изменения текста, после которой таблица разбирается заново
+PARSE_DEBOUNCE_MS = 400
+
+
+class DataFrameModel(QAbstractTableModel):
+    """Модель поверх DataFrame: ячейки читаются только при отрисовке видимой части.
+
+    Строка 0 отведена под выбор типа столбца (там стоят QComboBox),
+    данные таблицы начинаются со строки 1.
+    """
+
+    def __init__(self, df, parent=None):
+        super().__init__(parent)
+        self.df = df
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.df) + 1
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.df.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid() or index.row() == 0:
+            return None
+        return str(self.df.iat[index.row() - 1, index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self.df.columns[section])
+        return str(section) if section else ""
+
+
+class ProblemsModel(QAbstractTableModel):
+    """Список проблем (товар, статус, ошибка) для таблицы итогов; ячейки — только видимые"""
+
+    HEADERS = ["Товар", "Статус", "Ошибка"]
+
+    def __init__(self, problems, parent=None):
+        super().__init__(parent)
+        self.problems = problems
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.problems)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return str(self.problems[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+
+class ParseSignals(QObject):
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class ParseTask(QRunnable):
+    """Разбор текста таблицы в фоновом потоке"""
+
+    def __init__(self, generation, raw):
+        super().__init__()
+        self.generation = generation
+        self.raw = raw
+        self.signals = ParseSignals()
+
+    def run(self):
+        try:
+            df = parse_table(self.raw)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, df)
+
+
+class CategorySignals(QObject):
+    loaded = Signal(object)
+
+
+class CategoryTask(QRunnable):
+    """Список категорий VK: из кэша на диске или из API в фоне"""
+
+    def __init__(self, api):
+        super().__init__()
+        self.api = api
+        self.signals = CategorySignals()
+
+    def run(self):
+        try:
+            categories = load_categories(self.api)
+        except Exception:
+            return
+        self.signals.loaded.emit(categories)
+
+
+class UploadSignals(QObject):
+    result = Signal(int, object)
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class UploadTask(QRunnable):
+    """Загрузка или синхронизация товаров в фоновом потоке.
+
+    job(on_result, should_cancel) делает всю работу; результаты по товарам
+    и итог приходят в окно сигналами, окно при этом не замирает.
+    """
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.cancelled = threading.Event()
+        self.signals = UploadSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            outcome = self.job(self.signals.result.emit, self.cancelled.is_set)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(outcome)
+
+
+class ResultsDialog(QDialog):
+    """Итог загрузки: сводка и таблица товаров, с которыми что-то не так"""
+
+    def __init__(self, title, message, problems, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(900, 600 if problems else 250)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(message))
+
+        if problems:
+            layout.addWidget(QLabel(f"Требуют внимания: {len(problems)}"))
+            # На больших файлах отклонённых строк бывают сотни тысяч — элемент на ячейку не создаём
+            table = QTableView()
+            table.setModel(ProblemsModel(problems, table))
+            table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            header = table.horizontalHeader()
+            header.setDefaultSectionSize(200)
+            header.setStretchLastSection(True)
+            layout.addWidget(table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok)
+        buttons.accepted.connect(self.accept)
+        layout.addWidget(buttons)
+
+
+class TableFormatWindow(QWidget):
+    def __init__(self, api, groups, go_back_callback):
+        super().__init__()
+        self.api = api
+        # [(id, название)]; если сообществ несколько, товары загружаются во все сразу
+        self.groups = groups
+        self.group_id, self.group_name = groups[0]
+        self.go_back_callback = go_back_callback
+        self.setWindowTitle(f"Table Formatter - {', '.join(name for _, name in groups)}")
+        self.resize(900, 600)
+
+        self.column_types = {}
+        self.df = None
+        self.selected_category_id = None
+        # Файл, открытый через «Открыть файл»: в self.df тогда только его начало
+        self.source_path = None
+
+        # Фоновая загрузка/синхронизация и то, что копится по её ходу
+        self.upload_task = None
+        self.task_uploader = None
+        self.progress = None
+        self.problems = []
+
+        # Категории VK грузятся в фоне, пока пользователь вставляет таблицу
+        self.categories = None
+        # Задачу держим до результата, иначе её сигналы могут удалиться раньше, чем сработают
+        self.category_task = CategoryTask(self.api)
+        self.category_task.signals.loaded.connect(self.on_categories_loaded)
+        QThreadPool.globalInstance().start(self.category_task)
+
+        # Номер последнего запущенного разбора: устаревшие результаты отбрасываем
+        self.parse_generation = 0
+        # Номер разбора -> задача. Держим задачи до результата, иначе их сигналы
+        # могут удалиться раньше, чем сработают
+        self.parse_tasks = {}
+        self.parse_timer = QTimer(self)
+        self.parse_timer.setSingleShot(True)
+        self.parse_timer.setInterval(PARSE_DEBOUNCE_MS)
+        self.parse_timer.timeout.connect(self.process_text)
+
+        self.setStyleSheet("""
+            QWidget { font-size: 14pt; }
+            QPushButton { font-size: 16pt; min-height: 40px; padding: 8px; }
+            QLabel { font-size: 14pt; }
+            QPlainTextEdit { font-family: Courier; font-size: 14pt; }
+        """)
+
+        layout = QVBoxLayout(self)
+
+        self.back_btn = QPushButton("← Назад")
+        self.back_btn.clicked.connect(self.go_back_callback)
+        layout.addWidget(self.back_btn)
+
+        self.input_label = QLabel("Входные данные:")
+        layout.addWidget(self.input_label)
+
+        self.open_btn = QPushButton("Открыть файл...")
+        self.open_btn.clicked.connect(self.open_file)
+        layout.addWidget(self.open_btn)
+
+        self.input = QPlainTextEdit()
+        self.input.setPlaceholderText("Вставьте таблицу (TSV/CSV/;-CSV)...")
+        self.input.textChanged.connect(self.parse_timer.start)
+        layout.addWidget(self.input)
+
+        self.upload_btn = QPushButton("Добавить товары")
+        self.upload_btn.clicked.connect(self.upload_items)
+        self.upload_btn.setEnabled(False)
+        layout.addWidget(self.upload_btn)
+
+        self.sync_btn = QPushButton("Синхронизировать с магазином")
+        self.sync_btn.clicked.connect(self.sync_items)
+        self.sync_btn.setEnabled(False)
+        layout.addWidget(self.sync_btn)
+        self.stock_btn = QPushButton("Обновить цены и остатки")
+        self.stock_btn.clicked.connect(self.update_stock)
+        self.stock_btn.setEnabled(False)
+        layout.addWidget(self.stock_btn)
+
+        # Синхронизация и обновление остатков сравнивают таблицу с одним магазином
+        self.sync_btn.setVisible(len(groups) == 1)
+        self.stock_btn.setVisible(len(groups) == 1)
+
+        self.table = QTableView()
+        self.table.hide()
+        layout.addWidget(self.table)
+
+    def on_categories_loaded(self, categories):
+        self.category_task = None
+        self.categories = categories
+
+    def get_product_categories(self):
+        """Категории товаров: уже загруженные в фоне, а если ещё нет — загружаем сейчас"""
+        if self.categories:
+            return self.categories
+        try:
+            self.categories = load_categories(self.api)
+            return self.categories
+
+        except VkApiError as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при получении категорий: {e.message}")
+            return None
+
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при получении категорий: {str(e)}")
+            return None
+
+    def show_category_dialog(self):
+        """Показываем диалог выбора категории"""
+        categories = self.get_product_categories()
+        if not categories:
+            # Создаем базовые категории, если их нет
+            categories = [
+                {"id": 1, "name": "Одежда"},
+                {"id": 2, "name": "Обувь"},
+                {"id": 3, "name": "Аксессуары"},
+                {"id": 4, "name": "Электроника"},
+                {"id": 5, "name": "Другое"}
+            ]
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Выбор категории")
+        dialog.setMinimumWidth(400)
+
+        layout = QVBoxLayout()
+
+        label = QLabel("Выберите категорию для товаров:")
+        layout.addWidget(label)
+
+        category_combo = QComboBox()
+        for category in categories:
+            category_combo.addItem(category["name"], category["id"])
+        layout.addWidget(category_combo)
+
+        # Свои категории VK создавать не даёт — свои группы товаров в сообществе это подборки
+        layout.addWidget(QLabel("Добавить товары в новую подборку:"))
+        album_edit = QLineEdit()
+        album_edit.setPlaceholderText("Название подборки (необязательно)")
+        layout.addWidget(album_edit)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+
+        dialog.setLayout(layout)
+
+        if dialog.exec() == QDialog.Accepted:
+            return {"id": category_combo.currentData(), "name": category_combo.currentText(),
+                    "album": album_edit.text().strip() or None}
+        return None
+
+    def open_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Открыть таблицу", "", TABLE_FILE_FILTER)
+        if not path:
+            return
+        try:
+            df = read_table_preview(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка при чтении файла", str(e))
+            return
+        if df is None:
+            QMessageBox.warning(self, "Ошибка", "Файл пустой")
+            return
+
+        # Разбор вставленного текста, если он ещё идёт, больше не нужен
+        self.parse_generation += 1
+        self.source_path = path
+        self.show_table(df)
+
+    def process_text(self):
+        raw = self.input.toPlainText().strip()
+        self.parse_generation += 1
+        self.source_path = None
+
+        if not raw:
+            self.table.hide()
+            self.input_label.show()
+            self.input.show()
+            self.open_btn.show()
+            self.upload_btn.setEnabled(False)
+            self.sync_btn.setEnabled(False)
+            self.stock_btn.setEnabled(False)
+            return
+
+        task = ParseTask(self.parse_generation, raw)
+        task.signals.finished.connect(self.on_parsed)
+        task.signals.failed.connect(self.on_parse_failed)
+        self.parse_tasks[self.parse_generation] = task
+        QThreadPool.globalInstance().start(task)
+
+    def on_parse_failed(self, generation, error):
+        self.parse_tasks.pop(generation, None)
+        if generation != self.parse_generation:
+            return
+        self.table.hide()
+        self.input_label.show()
+        self.input.show()
+        self.open_btn.show()
+        self.upload_btn.setEnabled(False)
+        self.sync_btn.setEnabled(False)
+        self.stock_btn.setEnabled(False)
+        QMessageBox.critical(self, "Ошибка при разборе таблицы", error)
+
+    def on_parsed(self, generation, df):
+        self.parse_tasks.pop(generation, None)
+        if generation != self.parse_generation:
+            return
+        self.show_table(df)
+
+    def show_table(self, df):
+        self.df = df
+
+        self.input_label.hide()
+        self.input.hide()
+        self.open_btn.hide()
+        self.table.show()
+        self.upload_btn.setEnabled(True)
+        self.sync_btn.setEnabled(True)
+        self.stock_btn.setEnabled(True)
+        self.populate_table(self.df)
+
+    def populate_table(self, df: pd.DataFrame):
+        self.column_types = {}
+        old_model = self.table.model()
+        model = DataFrameModel(df, self.table)
+        self.table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+
+        for j, col in enumerate(df.columns):
+            combo = QComboBox()
+            combo.addItems(HEADER_OPTIONS)
+            combo.setCurrentText("Не использовать")
+            combo.currentTextChanged.connect(lambda text, col=j: self.update_column_type(col, text))
+            self.table.setIndexWidget(model.index(0, j), combo)
+
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setDefaultSectionSize(150)
+        header.setMaximumSectionSize(300)
+
+    def update_column_type(self, column_index, column_type):
+        self.column_types[column_index] = column_type
+
+    def check_required_columns(self):
+        # Проверяем обязательные поля
+        missing_fields = missing_columns(self.column_types)
+        if missing_fields:
+            QMessageBox.warning(self, "Ошибка",
+                                f"Не выбраны обязательные поля: {', '.join(missing_fields)}")
+            return False
+        return True
+
+    def category_index(self):
+        """Категории для столбца «Категория»; None, если их не удалось получить (ошибка уже показана)"""
+        if "Категория" not in self.column_types.values():
+            return CategoryIndex([])
+        # Фоновая загрузка могла ещё не закончиться или не удаться
+        categories = self.get_product_categories()
+        return CategoryIndex(categories) if categories is not None else None
+
+    def items_reader(self, category_name):
+        """read() -> (items, rejected) по таблице или файлу, как они выбраны сейчас.
+
+        read не трогает окно, поэтому его можно вызывать из фоновой задачи.
+        None, если не удалось получить категории VK.
+        """
+        source_path, df, column_types = self.source_path, self.df, dict(self.column_types)
+        categories = self.category_index()
+        if categories is None:
+            return None
+
+        def read():
+            if source_path:
+                rejected = []
+                items = list(iter_file_items(source_path, column_types, category_name, rejected,
+                                             categories=categories))
+                return items, rejected
+            return prepare_items(df, column_types, category_name, categories=categories)
+        return read
+
+    def collect_items(self, category_name):
+        """Собираем товары из таблицы; None, если загружать нечего"""
+        if not self.check_required_columns():
+            return None
+
+        read = self.items_reader(category_name)
+        if read is None:
+            return None
+        items, rejected = read()
+        if rejected:
+            self.show_validation_report(rejected, len(items))
+
+        if not items:
+            QMessageBox.warning(self, "Ошибка", "Нет товаров для загрузки после проверки")
+            return None
+        return items
+
+    def show_validation_report(self, rejected, accepted_count):
+        """Один отчёт по всем отклонённым строкам вместо окна на каждую"""
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Warning)
+        box.setWindowTitle("Проверка данных")
+        box.setText(f"Отклонено строк: {len(rejected)}\nПрошло проверку: {accepted_count}")
+        box.setDetailedText("\n".join(f"Строка {row}: {reason}" for row, reason in rejected))
+        box.exec()
+
+    def select_category(self):
+        if not hasattr(self, 'df') or self.df is None:
+            QMessageBox.warning(self, "Ошибка", "Нет данных для загрузки")
+            return None
+
+        # Выбираем категорию
+        category = self.show_category_dialog()
+        if category:
+            self.selected_category_id = category["id"]
+        return category
+
+    def upload_items(self):
+        category = self.select_category()
+        if not category:
+            return
+
+        self.upload_rejected = []
+        if self.source_path:
+            # Файл читается кусками прямо во время загрузки, сколько всего строк — заранее неизвестно
+            if not self.check_required_columns():
+                return
+            categories = self.category_index()
+            if categories is None:
+                return
+            items = iter_file_items(self.source_path, self.column_types, category["name"], self.upload_rejected,
+                                    categories=categories)
+            total = 0
+        else:
+            items = self.collect_items(category["name"])
+            if not items:
+                return
+            total = len(items) * len(self.groups)
+
+        if len(self.groups) > 1:
+            uploader = MultiGroupUploader(self.api, [group_id for group_id, _ in self.groups],
+                                          self.selected_category_id, journal_factory=UploadJournal.for_group,
+                                          album=category["album"], index_factory=ItemIndex.for_group)
+
+            def job(on_result, should_cancel):
+                uploader.upload(items, on_result=on_result, should_cancel=should_cancel)
+                return self.dump_metrics(uploader)
+        else:
+            uploader = ProductUploader(self.api, self.group_id, self.selected_category_id,
+                                       journal=UploadJournal.for_group(self.group_id), album=category["album"],
+                                       item_index=ItemIndex.for_group(self.group_id))
+
+            def job(on_result, should_cancel):
+                uploader.upload(items, on_result=on_result, should_cancel=should_cancel, collect=False)
+                return self.dump_metrics(uploader)
+
+        self.upload_total = total
+        self.upload_category_name = category["name"]
+        self.upload_counts = {"done": 0, "success": 0, "skipped": 0}
+        self.start_task(uploader, job, "Загрузка", "Загрузка товаров...", total,
+                        self.on_upload_result, self.on_upload_finished)
+
+    def on_upload_result(self, done, result):
+        counts = self.upload_counts
+        counts["done"] = done
+        if result["skipped"]:
+            counts["skipped"] += 1
+        elif result["item_id"]:
+            counts["success"] += 1
+        self.add_problems(result)
+
+        total = self.upload_total
+        rate = self.task_uploader.metrics.items_per_second()
+        if total:
+            eta = format_eta(self.task_uploader.metrics.eta(total - done))
+            self.progress.setLabelText(f"Загрузка товаров... {done}/{total}\n"
+                                       f"{rate:.1f} товаров/с, осталось примерно {eta}")
+            self.progress.setValue(done)
+        else:
+            self.progress.setLabelText(f"Загрузка товаров... обработано строк: {done}\n{rate:.1f} товаров/с")
+
+    def on_upload_finished(self, metrics_path):
+        metrics = self.task_uploader.metrics.to_dict()
+        cancelled = self.upload_task.cancelled.is_set()
+        self.finish_task()
+
+        counts = self.upload_counts
+        # Строки файла, не прошедшие проверку, — в ту же таблицу, что и ошибки загрузки
+        for row, reason in self.upload_rejected:
+            self.problems.append((f"Строка {row}", "Отклонена", reason))
+
+        message = (f"Загрузка {'остановлена' if cancelled else 'завершена'}!\n"
+                   f"Успешно добавлено: {counts['success']}/{self.upload_total or counts['done']} товаров\n")
+        if counts["skipped"]:
+            message += f"Уже были загружены ранее (пропущено): {counts['skipped']}\n"
+        if len(self.groups) > 1:
+            message += f"Сообществ: {len(self.groups)}\n"
+        if metrics["counters"]["api_retries"]:
+            message += f"Повторных запросов к VK: {metrics['counters']['api_retries']}\n"
+        message += f"Скорость: {metrics['items_per_second']} товаров/с\n"
+        if metrics_path:
+            message += f"Отчёт: {metrics_path}\n"
+        ResultsDialog("Готово", message + f"Категория: {self.upload_category_name}", self.problems, self).exec()
+
+    def start_task(self, uploader, job, title, label, total, on_result, on_finished):
+        """Запускаем job в фоне; пока он идёт, окно показывает прогресс и не даёт начать второй"""
+        self.task_uploader = uploader
+        self.problems = []
+
+        self.progress = QProgressDialog(label, "Отмена", 0, total, self)
+        self.progress.setWindowTitle(title)
+        self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.setAutoClose(False)
+        self.progress.setAutoReset(False)
+        self.progress.show()
+
+        task = UploadTask(job)
+        if on_result:
+            task.signals.result.connect(on_result)
+        task.signals.finished.connect(on_finished)
+        task.signals.failed.connect(self.on_task_failed)
+        self.progress.canceled.connect(task.cancel)
+        self.upload_task = task
+        self.set_busy(True)
+        QThreadPool.globalInstance().start(task)
+
+    def finish_task(self):
+        self.upload_task = None
+        self.progress.close()
+        self.set_busy(False)
+
+    def on_task_failed(self, error):
+        self.finish_task()
+        ResultsDialog("Ошибка", f"Загрузка прервана: {error}", self.problems, self).exec()
+
+    def set_busy(self, busy):
+        # Уйти назад или запустить вторую загрузку, пока идёт первая, нельзя
+        self.back_btn.setEnabled(not busy)
+        self.upload_btn.setEnabled(not busy)
+        self.sync_btn.setEnabled(not busy)
+        self.stock_btn.setEnabled(not busy)
+
+    def add_problems(self, result):
+        name = result["item"]["name"]
+        if len(self.groups) > 1:
+            name = f"{dict(self.groups).get(result['group_id'], result['group_id'])}: {name}"
+        if result["error"]:
+            self.problems.append((name, "Ошибка", result["error"]))
+        if result["photo_error"]:
+            self.problems.append((name, "Без фото", result["photo_error"]))
+
+    def dump_metrics(self, uploader):
+        """Сохраняем замеры загрузки; без них загрузка всё равно считается успешной"""
+        try:
+            return uploader.metrics.dump()
+        except OSError as e:
+            print(f"Не удалось сохранить отчёт о загрузке: {str(e)}")
+            return None
+
+    def sync_items(self):
+        category = self.select_category()
+        if not category or not self.check_required_columns():
+            return
+
+        read = self.items_reader(category["name"])
+        if read is None:
+            return
+        # Сопоставляем по артикулу, если такой столбец выбран, иначе по названию
+        key = "sku" if "Артикул" in self.column_types.values() else "name"
+
+        def job(on_result, should_cancel):
+            # Чтение таблицы и все страницы market.get — в фоне, окно не замирает
+            items, rejected = read()
+            if not items or should_cancel():
+                return items, rejected, None
+            try:
+                existing = fetch_market_items(self.api, self.group_id)
+            except Exception as e:
+                raise RuntimeError(f"Не удалось получить товары сообщества: {str(e)}") from e
+            return items, rejected, diff_catalog(items, existing, key)
+
+        self.sync_category = category
+        self.start_task(None, job, "Синхронизация", "Получение товаров сообщества...", 0,
+                        None, self.on_sync_planned)
+
+    def on_sync_planned(self, outcome):
+        items, rejected, plan = outcome
+        cancelled = self.upload_task.cancelled.is_set()
+        self.finish_task()
+        if cancelled:
+            return
+        if rejected:
+            self.show_validation_report(rejected, len(items))
+        if not items:
+            QMessageBox.warning(self, "Ошибка", "Нет товаров для загрузки после проверки")
+            return
+
+        category = self.sync_category
+        summary = (f"Добавить: {len(plan['add'])}\nИзменить: {len(plan['edit'])}\n"
+                   f"Без изменений: {plan['unchanged']}\n"
+                   f"Нет в таблице: {len(plan['delete'])}")
+        if not plan["add"] and not plan["edit"] and not plan["delete"]:
+            QMessageBox.information(self, "Синхронизация", "Магазин уже совпадает с таблицей.\n\n" + summary)
+            return
+
+        delete = False
+        if plan["delete"]:
+            answer = QMessageBox.question(
+                self, "Синхронизация",
+                summary + "\n\nУдалить из магазина товары, которых нет в таблице?",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel
+            )
+            if answer == QMessageBox.Cancel:
+                return
+            delete = answer == QMessageBox.Yes
+
+        total = len(plan["add"]) + len(plan["edit"]) + (len(plan["delete"]) if delete else 0)
+        if not total:
+            return
+
+        uploader = ProductUploader(self.api, self.group_id, self.selected_category_id,
+                                   journal=UploadJournal.for_group(self.group_id), album=category["album"],
+                                   item_index=ItemIndex.for_group(self.group_id))
+
+        def job(on_result, should_cancel):
+            results = CatalogSync(uploader).apply(plan, on_result, should_cancel, delete)
+            self.dump_metrics(uploader)
+            return results
+
+        self.sync_unchanged = plan["unchanged"]
+        self.start_task(uploader, job, "Синхронизация", "Синхронизация товаров...", total,
+                        self.on_sync_result, self.on_sync_finished)
+
+    def update_stock(self):
+        """Быстрый путь: только цены и остатки уже загруженных товаров, без фото"""
+        if not self.check_required_columns():
+            return
+        read = self.items_reader("")
+        if read is None:
+            return
+
+        key = "sku" if "Артикул" in self.column_types.values() else "name"
+        index = ItemIndex.for_group(self.group_id)
+        uploader = ProductUploader(self.api, self.group_id, self.selected_category_id, item_index=index)
+
+        def job(on_result, should_cancel):
+            # Файл читается здесь же, в фоне, — целиком он может читаться долго
+            items, rejected = read()
+            plan = plan_stock_update(items, index, key)
+            if plan["missing"]:
+                # Товары могли добавить не через нас — один раз сверяемся с магазином
+                refresh_index(self.api, self.group_id, index)
+                plan = plan_stock_update(items, index, key)
+            results = CatalogSync(uploader).apply(plan, on_result, should_cancel)
+            self.dump_metrics(uploader)
+            return plan, results, rejected
+
+        self.start_task(uploader, job, "Цены и остатки", "Обновление цен и остатков...", 0,
+                        self.on_stock_result, self.on_stock_finished)
+
+    def on_stock_result(self, done, result):
+        rate = self.task_uploader.metrics.items_per_second()
+        self.progress.setLabelText(f"Обновление цен и остатков... изменено: {done}\n{rate:.1f} товаров/с")
+        self.add_problems(result)
+
+    def on_stock_finished(self, outcome):
+        plan, results, rejected = outcome
+        cancelled = self.upload_task.cancelled.is_set()
+        self.finish_task()
+        for item in plan["missing"]:
+            self.problems.append((item["name"], "Нет в магазине", "Сначала добавьте товар"))
+        # Строки, не прошедшие проверку, — в ту же таблицу, что и ошибки
+        for row, reason in rejected:
+            self.problems.append((f"Строка {row}", "Отклонена", reason))
+        edited = sum(1 for result in results if not result["error"])
+        message = (f"Обновление {'остановлено' if cancelled else 'завершено'}!\n"
+                   f"Изменено: {edited}\nБез изменений: {plan['unchanged']}\n"
+                   f"Нет в магазине: {len(plan['missing'])}")
+        if rejected:
+            message += f"\nОтклонено строк: {len(rejected)}"
+        ResultsDialog("Готово", message, self.problems, self).exec()
+
+    def on_sync_result(self, done, result):
+        self.progress.setValue(done)
+        self.add_problems(result)
+
+    def on_sync_finished(self, results):
+        cancelled = self.upload_task.cancelled.is_set()
+        self.finish_task()
+        counts = {"add": 0, "edit": 0, "delete": 0}
+        for result in results:
+            if not result["error"] and not result["skipped"]:
+                counts[result["action"]] += 1
+        message = (f"Синхронизация {'остановлена' if cancelled else 'завершена'}!\nДобавлено: {counts['add']}\nИзменено: {counts['edit']}\n"
+                   f"Удалено: {counts['delete']}\nБез изменений: {self.sync_unchanged}")
+        ResultsDialog("Готово", message, self.problems, self).exec()
@@ -0,0 +1,443 @@
+# uploader.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from itertools import islice
+
+from cache import PhotoCache, PhotoIdStore, PreparedPhotoCache
+from images import Image, prepare_photo
+from metrics import UploadMetrics
+from vk_api import VkApiError, ExecuteBatcher, EXECUTE_BATCH_SIZE, UPLOAD_TIMEOUT
+
+# Сколько товаров загружается одновременно. Вызовы API всё равно ограничены
+# лимитером и собираются в execute, а скачивание и отправка фото идут
+# параллельно с ними. Потоков на две пачки: пока одна пачка в пути, следующая
+# уже набирается.
+UPLOAD_WORKERS = EXECUTE_BATCH_SIZE * 2
+
+# Сколько товаров добавлять в подборку одним вызовом market.addToAlbum
+ALBUM_CHUNK = 100
+
+# VK отвечает на market.add с удалённым фото ошибкой 100 (неверный параметр),
+# в тексте которой упоминается фото
+PARAM_ERROR = 100
+
+
+def stale_photo_error(error):
+    """Ошибка market.add из-за того, что сохранённого photo_id в VK больше нет.
+
+    Сетевые сбои (code None) и другие ошибки проверки сюда не относятся: товар
+    мог уже создаться, а повторный market.add сделал бы дубликат.
+    """
+    return error.code == PARAM_ERROR and "photo" in error.message.lower()
+
+
+# Процессов для пережатия фото: декодирование и JPEG-кодирование упираются в CPU
+IMAGE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class PhotoSource:
+    """Скачивание и пережатие фото — общие для всех сообществ, куда идёт загрузка.
+
+    Одно и то же фото скачивается и пережимается один раз, даже если его
+    одновременно ждут потоки разных загрузок.
+    """
+
+    def __init__(self, api, photo_cache=None, prepared_cache=None):
+        self.api = api
+        self.photo_cache = photo_cache or PhotoCache()
+        self.prepared_cache = prepared_cache or PreparedPhotoCache()
+
+        # Одинаковые фото, которые сейчас качаются или загружаются другим потоком
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+
+        # Пул процессов для пережатия фото, создаётся при первом фото
+        self.image_pool = None
+        self.image_pool_lock = threading.Lock()
+
+    def once(self, key, func):
+        """Выполняем func один раз на ключ, остальные потоки ждут её результат"""
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(func())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[key]
+        return future.result()
+
+    def download(self, photo_url, metrics):
+        """Возвращает (hash, bytes): из кэша, если это фото уже скачивали"""
+        digest, data = self.photo_cache.get_url(photo_url)
+        if data is None:
+            with metrics.stage("download"):
+                data = self.api.download(photo_url)
+            metrics.add_bytes("download", len(data))
+            digest = self.photo_cache.put_url(photo_url, data)
+        else:
+            metrics.count("photo_cache_hits")
+        return digest, data
+
+    def fetch(self, photo_url, metrics):
+        return self.once(("url", photo_url), lambda: self.download(photo_url, metrics))
+
+    def prepared(self, digest, photo_data, metrics):
+        """Пережатое фото: из кэша или пережимаем (один раз на хэш)"""
+        data = self.prepared_cache.get(digest)
+        if data is not None:
+            metrics.count("prepared_cache_hits")
+            return data
+        return self.once(("prepared", digest), lambda: self.preprocess(digest, photo_data, metrics))
+
+    def preprocess(self, digest, photo_data, metrics):
+        """Пережимаем фото в пуле процессов; если не вышло — отправляем как есть"""
+        if Image is None:
+            # Без Pillow пережимать нечем — процессы только вернули бы те же байты
+            return photo_data
+        data = self.prepared_cache.get(digest)
+        if data is not None:
+            return data
+        with self.image_pool_lock:
+            if self.image_pool is None:
+                # Пул создаётся из потока загрузки, когда рядом работают десятки потоков и Qt:
+                # fork такого процесса может зависнуть, spawn — нет (freeze_support уже вызван)
+                self.image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+        try:
+            with metrics.stage("preprocess"):
+                data = self.image_pool.submit(prepare_photo, photo_data).result()
+        except Exception:
+            metrics.count("preprocess_errors")
+            return photo_data
+        self.prepared_cache.put(data, key=digest)
+        return data
+
+    def close(self):
+        if self.image_pool is not None:
+            self.image_pool.shutdown()
+            self.image_pool = None
+        self.photo_cache.flush()
+
+
+class ProductUploader:
+    """Параллельная загрузка товаров в сообщество.
+
+    photos — общий PhotoSource, когда тот же каталог идёт сразу в несколько
+    сообществ; без него у загрузки свой, и он закрывается вместе с ней.
+    album — название новой подборки: она создаётся в начале загрузки, и все
+    добавленные товары попадают в неё. В item_index (ItemIndex) записываются
+    созданные товары.
+    """
+
+    def __init__(self, api, group_id, category_id, workers=UPLOAD_WORKERS,
+                 photo_cache=None, photo_ids=None, journal=None, metrics=None, photos=None, album=None,
+                 item_index=None):
+        self.api = api
+        self.group_id = abs(group_id)
+        self.category_id = category_id
+        self.workers = workers
+        self.batcher = None
+        self.owns_photos = photos is None
+        self.photos = photos or PhotoSource(api, photo_cache)
+        self.photo_ids = photo_ids or PhotoIdStore()
+        self.journal = journal
+        self.item_index = item_index
+        # Общие замеры (metrics) останавливает тот, кто их передал, — когда закончится вся работа
+        self.owns_metrics = metrics is None
+        self.metrics = metrics or UploadMetrics(api)
+
+        self.album = album
+        self.album_id = None
+        self.album_items = []
+        self.album_lock = threading.Lock()
+
+    def download_photo(self, photo_url):
+        """Возвращает (hash, bytes): из кэша, если это фото уже скачивали"""
+        return self.photos.fetch(photo_url, self.metrics)
+
+    def upload_photo(self, photo_url):
+        """Возвращает (photo_id, reused): photo_id уже загруженного фото берём из хранилища"""
+        digest, photo_data = self.download_photo(photo_url)
+
+        photo_id = self.photo_ids.get(self.group_id, digest)
+        if photo_id:
+            self.metrics.count("photo_ids_reused")
+            return photo_id, True
+
+        def upload():
+            photo_id = self.photo_ids.get(self.group_id, digest)
+            if not photo_id:
+                photo_id = self.save_photo(self.photos.prepared(digest, photo_data, self.metrics))
+                self.photo_ids.set(self.group_id, digest, photo_id)
+            return photo_id
+
+        # photo_id у каждого сообщества свой, поэтому и загрузка — своя на сообщество
+        return self.photos.once(("hash", self.group_id, digest), upload), False
+
+    def post_photo(self, photo_data, refresh=False):
+        upload_url = self.api.market_upload_url(self.group_id, refresh=refresh)
+        with self.metrics.stage("upload_post"):
+            upload_response = self.api.session.post(
+                upload_url,
+                files={"file": ("photo.jpg", photo_data, "image/jpeg")},
+                timeout=UPLOAD_TIMEOUT
+            ).json()
+        self.metrics.add_bytes("upload_post", len(photo_data))
+
+        if "error" in upload_response:
+            error = upload_response["error"]
+            raise Exception(error["error_msg"] if isinstance(error, dict) else error)
+        return upload_response
+
+    def save_photo(self, photo_data):
+        """Отправляем фото на сервер загрузки и сохраняем в VK"""
+        try:
+            upload_response = self.post_photo(photo_data)
+        except Exception:
+            # Сервер загрузки мог протухнуть — берём новый адрес и пробуем ещё раз
+            self.metrics.count("upload_server_refreshes")
+            upload_response = self.post_photo(photo_data, refresh=True)
+
+        self.metrics.count("api_calls")
+        with self.metrics.stage("save_photo"):
+            saved = self.batcher.call(
+                "photos.saveMarketPhoto",
+                group_id=self.group_id,
+                photo=upload_response["photo"],
+                server=upload_response["server"],
+                hash=upload_response["hash"],
+                crop_data=upload_response.get("crop_data", ""),
+                crop_hash=upload_response.get("crop_hash", "")
+            )
+        return saved[0]["id"]
+
+    def add_item(self, item, photo_id=None):
+        """Создаём товар в сообществе (owner_id с минусом)"""
+        params = {
+            "owner_id": f"-{self.group_id}",
+            "name": item["name"],
+            "description": item["description"],
+            "category_id": item.get("category_id") or self.category_id,
+            "price": item["price"]
+        }
+        if photo_id:
+            params["main_photo_id"] = photo_id
+        if item.get("sku"):
+            params["sku"] = item["sku"]
+        if "stock_amount" in item:
+            params["stock_amount"] = item["stock_amount"]
+
+        self.metrics.count("api_calls")
+        with self.metrics.stage("market_add"):
+            response = self.batcher.call("market.add", **params)
+        if self.item_index is not None:
+            self.item_index.record(response["market_item_id"], item, self.category_id)
+        if self.album_id:
+            with self.album_lock:
+                self.album_items.append(response["market_item_id"])
+        return response["market_item_id"]
+
+    def create_album(self):
+        self.metrics.count("api_calls")
+        response = self.api.call("market.addAlbum", owner_id=f"-{self.group_id}", title=self.album)
+        self.album_id = response["market_album_id"]
+
+    def fill_album(self):
+        """Добавляем созданные товары в подборку пачками"""
+        with self.album_lock:
+            item_ids, self.album_items = self.album_items, []
+        for start in range(0, len(item_ids), ALBUM_CHUNK):
+            self.metrics.count("api_calls")
+            self.api.call("market.addToAlbum", owner_id=f"-{self.group_id}",
+                          item_ids=",".join(map(str, item_ids[start:start + ALBUM_CHUNK])), album_ids=self.album_id)
+
+    def upload_item(self, item, resume=True):
+        with self.metrics.stage("item"):
+            return self._upload_item(item, resume)
+
+    def add_new_item(self, item):
+        """Товар создаётся, даже если по журналу строка уже загружалась (решение принял diff каталога)"""
+        return self.upload_item(item, resume=False)
+
+    def _upload_item(self, item, resume=True):
+        record = self.journal.completed(item) if self.journal and resume else None
+        if record is not None:
+            # По журналу строка уже стала товаром
+            return {"item": item, "item_id": record["item_id"], "photo_id": record["photo_id"],
+                    "photo_error": None, "error": None, "skipped": True}
+
+        result = {"item": item, "item_id": None, "photo_id": None, "photo_error": None, "error": None,
+                  "skipped": False}
+
+        reused = False
+        if item["photo_url"]:
+            try:
+                result["photo_id"], reused = self.upload_photo(item["photo_url"])
+            except Exception as e:
+                result["photo_error"] = str(e)
+
+        try:
+            try:
+                result["item_id"] = self.add_item(item, result["photo_id"])
+            except VkApiError as e:
+                if not reused or not stale_photo_error(e):
+                    raise
+                # Сохранённый photo_id мог устареть (фото удалили) — загружаем заново
+                digest, _ = self.download_photo(item["photo_url"])
+                self.photo_ids.forget(self.group_id, digest)
+                result["photo_id"], _ = self.upload_photo(item["photo_url"])
+                result["item_id"] = self.add_item(item, result["photo_id"])
+        except VkApiError as e:
+            error_msg = e.message
+            if "name should be at least 4 letters" in error_msg:
+                error_msg = "Название должно содержать минимум 4 символа"
+            result["error"] = error_msg
+        except Exception as e:
+            result["error"] = str(e)
+
+        if self.journal:
+            self.journal.record(item, "failed" if result["error"] else "done", result["photo_id"],
+                                result["item_id"], result["error"])
+        return result
+
+    def upload(self, items, on_result=None, should_cancel=None, collect=True):
+        """Загружаем товары пулом потоков.
+
+        items может быть генератором: строки берутся по мере освобождения потоков.
+        on_result(done, result) вызывается в вызывающем потоке по мере готовности,
+        should_cancel() проверяется между результатами.
+        Строки, которые по журналу уже стали товарами, пропускаются.
+        С collect=False результаты не накапливаются (для очень больших файлов).
+        """
+        try:
+            return self.add_items(items, on_result, should_cancel, [] if collect else None)
+        finally:
+            self.close()
+
+    def add_items(self, items, on_result=None, should_cancel=None, results=None, resume=True):
+        """Создаём товары (и подборку, если она задана), не закрывая загрузчик.
+
+        С resume=False журнал не пропускает строк, а только пополняется.
+        """
+        if self.album and not self.album_id:
+            self.create_album()
+        results = self.run(items, self.upload_item if resume else self.add_new_item, on_result, should_cancel,
+                           results)
+        if self.album_id:
+            self.fill_album()
+        return results
+
+    def close(self):
+        """Конец работы: сбрасываем на диск журнал, индекс товаров и кэши"""
+        if self.owns_metrics:
+            self.metrics.finish()
+        if self.owns_photos:
+            self.photos.close()
+        self.photo_ids.flush()
+        if self.item_index is not None:
+            self.item_index.flush()
+        if self.journal:
+            self.journal.close()
+
+    def run(self, tasks, action, on_result=None, should_cancel=None, results=None):
+        """Выполняем action(task) для всех задач пулом потоков с общим execute-батчером.
+
+        В работе держим не больше двух задач на поток, так что задачи из генератора
+        не вычитываются в память все сразу. Результаты дописываются в results,
+        если он передан.
+        """
+        done = len(results) if results is not None else 0
+        tasks = iter(tasks)
+        in_flight = set()
+        cancelled = False
+        self.batcher = ExecuteBatcher(self.api)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not cancelled:
+                for task in islice(tasks, self.workers * 2 - len(in_flight)):
+                    in_flight.add(executor.submit(action, task))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    self.metrics.item_done(result)
+                    done += 1
+                    if results is not None:
+                        results.append(result)
+                    if on_result:
+                        on_result(done, result)
+                cancelled = should_cancel is not None and should_cancel()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.batcher.close()
+        return results
+
+
+class MultiGroupUploader:
+    """Один и тот же каталог сразу в несколько сообществ.
+
+    На каждое сообщество свой ProductUploader со своими photo_id, журналом и
+    сервером загрузки; скачанные и пережатые фото у всех общие. Загрузки идут
+    одновременно, лимит запросов к API у них общий — он на токен.
+    """
+
+    def __init__(self, api, group_ids, category_id, workers=UPLOAD_WORKERS, journal_factory=None, album=None,
+                 index_factory=None):
+        self.api = api
+        self.photos = PhotoSource(api)
+        self.photo_ids = PhotoIdStore()
+        self.metrics = UploadMetrics(api)
+        # Потоки делим между сообществами, но так, чтобы каждому хватало на полную пачку execute
+        group_workers = max(EXECUTE_BATCH_SIZE, workers // max(1, len(group_ids)))
+        # Потоков выходит больше, чем соединений в пуле по умолчанию: по одному
+        # на каждый поток и на execute-батчер каждого сообщества
+        api.ensure_pool((group_workers + 1) * len(group_ids))
+        self.uploaders = [
+            ProductUploader(api, group_id, category_id, group_workers, photo_ids=self.photo_ids,
+                            journal=journal_factory(group_id) if journal_factory else None,
+                            metrics=self.metrics, photos=self.photos, album=album,
+                            item_index=index_factory(group_id) if index_factory else None)
+            for group_id in group_ids
+        ]
+
+    def upload(self, items, on_result=None, should_cancel=None):
+        """Загружаем items во все сообщества; в результатах есть group_id.
+
+        on_result(done, result) вызывается из потоков загрузок, по одному за раз.
+        Возвращает число обработанных пар «товар — сообщество».
+        """
+        items = list(items)
+        lock = threading.Lock()
+        done = 0
+
+        def callback(group_id):
+            def on_group_result(_, result):
+                nonlocal done
+                result["group_id"] = group_id
+                with lock:
+                    done += 1
+                    if on_result:
+                        on_result(done, result)
+            return on_group_result
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.uploaders)) as executor:
+                futures = [executor.submit(uploader.upload, items, callback(uploader.group_id), should_cancel, False)
+                           for uploader in self.uploaders]
+                for future in futures:
+                    future.result()
+        finally:
+            self.metrics.finish()
+            self.photos.close()
+        return done
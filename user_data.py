@@ -0,0 +1,38 @@
+# user_data.py
+
+import json
+import os
+import time
+
+from cache import CACHE_DIR, url_key, load_json, save_json
+
+USER_DATA_FILE = "user_data.json"
+
+# Список сообществ с прошлого запуска — чтобы окно появилось сразу, без groups.get
+GROUPS_CACHE_FILE = os.path.join(CACHE_DIR, "groups.json")
+
+
+def save_user_data(data):
+    with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def load_user_data():
+    if os.path.exists(USER_DATA_FILE):
+        with open(USER_DATA_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def load_cached_groups(token, path=GROUPS_CACHE_FILE):
+    """Сообщества, сохранённые для этого токена, или None (другой аккаунт — не показываем)"""
+    cached = load_json(path, None)
+    if not cached or cached.get("token") != url_key(token):
+        return None
+    return cached.get("items")
+
+
+def save_cached_groups(token, groups, path=GROUPS_CACHE_FILE):
+    # Сам токен в кэш не пишем, только его хэш
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    save_json(path, {"token": url_key(token), "saved_at": time.time(), "items": groups})
@@ -0,0 +1,340 @@
+# vk_api.py
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+API_URL = "https://api.vk.com/method/"
+API_VERSION = "5.199"
+
+# Лимит VK для пользовательского токена — 3 запроса в секунду
+API_REQUESTS_PER_SECOND = 3
+# Чуть медленнее лимита: VK считает запросы по времени прихода, и сетевой
+# разброс иначе иногда укладывает четвёртый запрос в ту же секунду
+RATE_MARGIN = 0.95
+
+# Максимум вызовов API внутри одного execute
+EXECUTE_BATCH_SIZE = 25
+
+# Таймауты (подключение, чтение) в секундах
+API_TIMEOUT = (5, 30)
+DOWNLOAD_TIMEOUT = (5, 10)
+UPLOAD_TIMEOUT = (5, 30)
+
+# Соединений на хост в пуле: не меньше числа потоков загрузки
+POOL_SIZE = 64
+
+# Ошибки VK, после которых запрос стоит повторить: 6 — слишком много запросов
+# в секунду, 9 — flood control, 10 — внутренняя ошибка сервера
+RETRYABLE_ERRORS = {6, 9, 10}
+# Ошибки, после которых нужно сбавить темп
+THROTTLE_ERRORS = {6, 9}
+# Вызовы, которые создают новое. Если запрос ушёл, а ответ потерялся, VK мог
+# его уже выполнить — повтор создал бы дубликат
+NON_IDEMPOTENT_METHODS = {"market.add", "market.addAlbum", "photos.saveMarketPhoto"}
+
+# Токен недействителен (отозван или истёк) — нужна новая авторизация
+AUTH_ERROR = 5
+
+
+def mount_pool(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def create_session(pool_size=POOL_SIZE):
+    """Session с keep-alive: TCP+TLS рукопожатие один раз на соединение, а не на запрос"""
+    session = requests.Session()
+    mount_pool(session, pool_size)
+    return session
+
+
+def not_sent(error):
+    """Сетевой сбой случился до отправки запроса: не удалось подключиться к серверу"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+class VkApiError(Exception):
+    """Ошибка, которую вернул VK API"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class RateLimiter:
+    """Потокобезопасный token bucket: не больше rate запросов в секунду.
+
+    По умолчанию запас — один токен: запросы идут равномерно, и в любое
+    скользящее окно в секунду их попадает не больше rate (так считает VK).
+    """
+
+    def __init__(self, rate=API_REQUESTS_PER_SECOND, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        pass
+
+    def on_throttle(self):
+        pass
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Token bucket, который вдвое сбавляет темп, когда VK просит притормозить,
+    и понемногу разгоняется обратно до max_rate после серии успешных запросов"""
+
+    def __init__(self, rate=API_REQUESTS_PER_SECOND, min_rate=0.5, increase_after=5, step=0.5):
+        super().__init__(rate)
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.increase_after = increase_after
+        self.step = step
+        self.successes = 0
+
+    def on_success(self):
+        with self.lock:
+            self.successes += 1
+            if self.successes >= self.increase_after and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.step)
+                self.successes = 0
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.successes = 0
+            # Пауза: накопленные токены сгорают
+            self.tokens = min(self.tokens, 0)
+
+
+class RetryPolicy:
+    """Экспоненциальная задержка между повторами со случайным разбросом"""
+
+    def __init__(self, max_retries=5, base_delay=0.5, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+
+class VkApi:
+    """Клиент VK API: общий пул соединений и лимитер для всех вызовов методов"""
+
+    def __init__(self, token, limiter=None, session=None, retry=None, api_url=API_URL):
+        self.token = token
+        self.api_url = api_url
+        self.limiter = limiter or AdaptiveRateLimiter(API_REQUESTS_PER_SECOND * RATE_MARGIN)
+        self.session = session or create_session()
+        self.pool_size = POOL_SIZE
+        self.pool_lock = threading.Lock()
+        self.retry = retry or RetryPolicy()
+
+        # Сколько HTTP-запросов к API отправлено и сколько из них были повторами
+        self.requests = 0
+        self.retries = 0
+        self.stats_lock = threading.Lock()
+
+        # group_id -> upload_url для фото товаров; VK принимает адрес повторно
+        self.upload_urls = {}
+        self.upload_urls_lock = threading.Lock()
+
+    def ensure_pool(self, size):
+        """Пул соединений не меньше size.
+
+        Соединение сверх пула закрывается после запроса, и следующий запрос снова
+        платит за TCP+TLS рукопожатие. Вызывать до начала загрузки: соединения
+        старого пула при замене теряются.
+        """
+        with self.pool_lock:
+            if size > self.pool_size:
+                mount_pool(self.session, size)
+                self.pool_size = size
+
+    def request(self, method, idempotent=None, **params):
+        """Сырой ответ API (POST — у execute длинный код не влезает в URL).
+
+        Ошибки 6, 9, 10 и сетевые сбои повторяются с нарастающей задержкой.
+        Неидемпотентный вызов после сетевого сбоя повторяется, только если
+        запрос не ушёл. По умолчанию такими считаются NON_IDEMPOTENT_METHODS
+        и execute, про код которого ничего не известно.
+        """
+        if idempotent is None:
+            idempotent = method not in NON_IDEMPOTENT_METHODS and method != "execute"
+        params.update({"access_token": self.token, "v": API_VERSION})
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            with self.stats_lock:
+                self.requests += 1
+            try:
+                response = self.session.post(self.api_url + method, data=params, timeout=API_TIMEOUT).json()
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                error = VkApiError(None, str(e))
+                if not idempotent and not not_sent(e):
+                    raise error
+            else:
+                if "error" not in response:
+                    self.limiter.on_success()
+                    return response
+                error = VkApiError(response["error"].get("error_code"), response["error"].get("error_msg", ""))
+                if error.code in THROTTLE_ERRORS:
+                    self.limiter.on_throttle()
+                if error.code not in RETRYABLE_ERRORS:
+                    raise error
+
+            if attempt >= self.retry.max_retries:
+                raise error
+            self.count_retry()
+            time.sleep(self.retry.delay(attempt))
+            attempt += 1
+
+    def count_retry(self):
+        with self.stats_lock:
+            self.retries += 1
+
+    def call(self, method, **params):
+        return self.request(method, **params)["response"]
+
+    def market_upload_url(self, group_id, refresh=False):
+        """Адрес сервера загрузки фото товаров; запрашиваем заново только при refresh"""
+        group_id = abs(group_id)
+        with self.upload_urls_lock:
+            if not refresh and group_id in self.upload_urls:
+                return self.upload_urls[group_id]
+        upload_url = self.call("photos.getMarketUploadServer", group_id=group_id, main_photo=1)["upload_url"]
+        with self.upload_urls_lock:
+            self.upload_urls[group_id] = upload_url
+        return upload_url
+
+    def download(self, url):
+        response = self.session.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+class ExecuteBatcher:
+    """Собирает вызовы из разных потоков и отправляет их пачками через execute.
+
+    Пачка уходит, когда набралось batch_size вызовов или прошло max_delay секунд
+    с первого вызова в очереди. Ошибка одного вызова не роняет всю пачку —
+    она попадает только в свой Future.
+    """
+
+    def __init__(self, api, batch_size=EXECUTE_BATCH_SIZE, max_delay=0.1):
+        self.api = api
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue = []
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, method, **params):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("ExecuteBatcher закрыт")
+            self.queue.append((method, params, future, 0))
+            self.condition.notify()
+        return future
+
+    def call(self, method, **params):
+        return self.submit(method, **params).result()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                deadline = time.monotonic() + self.max_delay
+                while len(self.queue) < self.batch_size and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.queue[:self.batch_size]
+                del self.queue[:self.batch_size]
+            self._send(batch)
+
+    def _send(self, batch):
+        if len(batch) == 1:
+            method, params, future, _ = batch[0]
+            try:
+                future.set_result(self.api.call(method, **params))
+            except Exception as e:
+                future.set_exception(e)
+            return
+
+        calls = ",".join(
+            f"API.{method}({json.dumps(params, ensure_ascii=False)})" for method, params, _, _ in batch
+        )
+        try:
+            idempotent = not any(method in NON_IDEMPOTENT_METHODS for method, _, _, _ in batch)
+            response = self.api.request("execute", idempotent=idempotent, code=f"return [{calls}];")
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        # Неудачный вызов возвращает false, а его ошибка идёт следующей по порядку в execute_errors
+        errors = iter(response.get("execute_errors", []))
+        retry = []
+        for (method, params, future, attempt), result in zip(batch, response["response"]):
+            if result is not False:
+                future.set_result(result)
+                continue
+            error = next(errors, {})
+            code = error.get("error_code")
+            if code in RETRYABLE_ERRORS and attempt < self.api.retry.max_retries:
+                retry.append((method, params, future, attempt + 1))
+                continue
+            future.set_exception(VkApiError(code, error.get("error_msg", f"{method}: ошибка")))
+
+        if retry:
+            if any(error.get("error_code") in THROTTLE_ERRORS for error in response.get("execute_errors", [])):
+                self.api.limiter.on_throttle()
+            for _ in retry:
+                self.api.count_retry()
+            time.sleep(self.api.retry.delay(max(attempt for _, _, _, attempt in retry) - 1))
+            with self.condition:
+                self.queue[:0] = retry
+                self.condition.notify()